@@ -14,7 +14,7 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 class Ui_Form(object):
     def setupUi(self, Form):
         Form.setObjectName("Form")
-        Form.resize(365, 186)
+        Form.resize(365, 210)
         self.gridLayoutWidget = QtWidgets.QWidget(Form)
         self.gridLayoutWidget.setGeometry(QtCore.QRect(10, 10, 341, 111))
         self.gridLayoutWidget.setObjectName("gridLayoutWidget")
@@ -112,6 +112,19 @@ class Ui_Form(object):
         self.undoButton = QtWidgets.QPushButton(Form)
         self.undoButton.setGeometry(QtCore.QRect(180, 160, 56, 17))
         self.undoButton.setObjectName("undoButton")
+        self.groupButton = QtWidgets.QPushButton(Form)
+        self.groupButton.setGeometry(QtCore.QRect(120, 160, 56, 17))
+        self.groupButton.setObjectName("groupButton")
+        self.allStatesCheckBox = QtWidgets.QCheckBox(Form)
+        self.allStatesCheckBox.setGeometry(QtCore.QRect(10, 160, 101, 17))
+        self.allStatesCheckBox.setObjectName("allStatesCheckBox")
+        self.clashCheckBox = QtWidgets.QCheckBox(Form)
+        self.clashCheckBox.setGeometry(QtCore.QRect(10, 186, 101, 17))
+        self.clashCheckBox.setObjectName("clashCheckBox")
+        self.clashLabel = QtWidgets.QLabel(Form)
+        self.clashLabel.setGeometry(QtCore.QRect(120, 186, 236, 17))
+        self.clashLabel.setText("")
+        self.clashLabel.setObjectName("clashLabel")
 
         self.retranslateUi(Form)
         QtCore.QMetaObject.connectSlotsByName(Form)
@@ -128,3 +141,6 @@ class Ui_Form(object):
         self.resetButton.setText(_translate("Form", "Reset"))
         self.redoButton.setText(_translate("Form", "Redo"))
         self.undoButton.setText(_translate("Form", "Undo"))
+        self.groupButton.setText(_translate("Form", "Group"))
+        self.allStatesCheckBox.setText(_translate("Form", "All states"))
+        self.clashCheckBox.setText(_translate("Form", "Clashes"))
@@ -0,0 +1,127 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Keyframe animation for the Transform Tool.
+# Keyframes are the object's accumulated transform at the time they were captured. The frames between them are
+# computed in one batch per segment: rotations with quaternion slerp, and the path of the object's center linearly
+# or with a Catmull-Rom spline. The frames are stored as movie states or object matrix keys, so playback runs in PyMOL alone
+
+import numpy as np
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+from . import transform
+from .copies import loadCopies, transformCopies
+
+# Capture the object's current transform as its next keyframe
+def addKeyframe(object):
+    object.keyframes.append(object.matrix.copy())
+
+# Return the unit quaternion (w, x, y, z) of a 3x3 rotation matrix
+def quaternionFromMatrix(m):
+    trace = m[0, 0] + m[1, 1] + m[2, 2]
+    if trace > 0:
+        s = 2.0 * np.sqrt(trace + 1.0)
+        q = [0.25 * s, (m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s]
+    elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[0, 0] - m[1, 1] - m[2, 2])
+        q = [(m[2, 1] - m[1, 2]) / s, 0.25 * s, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s]
+    elif m[1, 1] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[1, 1] - m[0, 0] - m[2, 2])
+        q = [(m[0, 2] - m[2, 0]) / s, (m[0, 1] + m[1, 0]) / s, 0.25 * s, (m[1, 2] + m[2, 1]) / s]
+    else:
+        s = 2.0 * np.sqrt(1.0 + m[2, 2] - m[0, 0] - m[1, 1])
+        q = [(m[1, 0] - m[0, 1]) / s, (m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, 0.25 * s]
+    q = np.array(q)
+    return q / np.linalg.norm(q)
+
+# Return the (n, 3, 3) rotation matrices of (n, 4) unit quaternions
+def matricesFromQuaternions(q):
+    w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    return np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)], axis=1),
+        np.stack([2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)], axis=1),
+        np.stack([2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)], axis=1),
+    ], axis=1)
+
+# Spherical linear interpolation from q0 to q1 at every fraction in s, along the shorter arc
+def slerp(q0, q1, s):
+    dot = np.dot(q0, q1)
+    if dot < 0:
+        q1 = -q1
+        dot = -dot
+    # Nearly equal rotations are interpolated linearly, which avoids dividing by a vanishing sine
+    if dot > 0.9995:
+        q = q0 + s[:, np.newaxis] * (q1 - q0)
+        return q / np.linalg.norm(q, axis=1)[:, np.newaxis]
+    theta = np.arccos(dot)
+    return (np.sin((1 - s) * theta)[:, np.newaxis] * q0 + np.sin(s * theta)[:, np.newaxis] * q1) / np.sin(theta)
+
+# Interpolate the points of a segment from p1 to p2 at every fraction in s, with p0 and p3 its neighbours
+def catmullRom(p0, p1, p2, p3, s):
+    s = s[:, np.newaxis]
+    return 0.5 * (2 * p1 + (p2 - p0) * s + (2 * p0 - 5 * p1 + 4 * p2 - p3) * s ** 2 + (3 * p1 - p0 - 3 * p2 + p3) * s ** 3)
+
+# Return the (n, 4, 4) matrices of the animation through the keyframes, with frames steps per segment.
+# center is the point of the untransformed object whose path is interpolated
+def interpolate(keyframes, center, frames, spline=False):
+    keys = np.array(keyframes)
+    rotations = keys[:, 0:3, 0:3]
+    # Where each keyframe puts the center
+    positions = rotations @ center + keys[:, 0:3, 3]
+    quaternions = [quaternionFromMatrix(rotation) for rotation in rotations]
+    s = np.arange(frames) / frames
+    segmentRotations = []
+    segmentPositions = []
+    for index in range(len(keys) - 1):
+        segmentRotations.append(slerp(quaternions[index], quaternions[index + 1], s))
+        if spline:
+            before = positions[max(index - 1, 0)]
+            after = positions[min(index + 2, len(keys) - 1)]
+            segmentPositions.append(catmullRom(before, positions[index], positions[index + 1], after, s))
+        else:
+            segmentPositions.append(positions[index] + s[:, np.newaxis] * (positions[index + 1] - positions[index]))
+    # End exactly on the last keyframe
+    segmentRotations.append(quaternions[-1][np.newaxis])
+    segmentPositions.append(positions[-1][np.newaxis])
+    rotations = matricesFromQuaternions(np.concatenate(segmentRotations))
+    positions = np.concatenate(segmentPositions)
+    matrices = np.tile(transform.identity(), (len(rotations), 1, 1))
+    matrices[:, 0:3, 0:3] = rotations
+    # Rotate about the center, then move the center along its path
+    matrices[:, 0:3, 3] = positions - rotations @ center
+    return matrices
+
+# Build the animation through the object's keyframes. With states, the frames are the states of a new object
+# named name; otherwise they are stored as object matrix keys of the object itself. A movie of the right length is set up
+# either way, and the number of frames is returned
+def animate(object, frames, name, states=True, spline=False):
+    if len(object.keyframes) < 2:
+        raise ValueError("at least two keyframes are needed")
+    object.commit()
+    # The center of the untransformed object
+    center = transform.transformPoint(transform.invert(object.matrix), object.getCenter())
+    matrices = interpolate(object.keyframes, center, frames, spline)
+    if states:
+        # Transform the untransformed coordinates to every frame in one batch
+        original = transform.invert(object.committedMatrix)
+        coords = cmd.get_coords(object.name, state=-1)
+        coords = (coords @ original[0:3, 0:3].T + original[0:3, 3]).astype(np.float32)
+        loadCopies(object.name, name, transformCopies(coords, matrices))
+        cmd.mset("1 -%d" % len(matrices))
+    else:
+        # The object matrix moves the coordinates as they are now, so each frame is taken relative to the committed transform
+        cmd.mset("1 x%d" % len(matrices))
+        inverse = transform.invert(object.committedMatrix)
+        for index, matrix in enumerate(matrices):
+            cmd.set_object_ttt(object.name, transform.toTTT(matrix @ inverse))
+            cmd.mview("store", index + 1, object=object.name)
+        # Show the object where the tool has it again
+        object.apply()
+    return len(matrices)
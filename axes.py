@@ -1,6 +1,12 @@
+import time
+
+import pymol
 from pymol import cmd
 from chempy import cpv
 
+# Seconds between checks of the viewport size, which PyMOL does not report as a view change
+VIEWPORT_REFRESH = 0.5
+
 class PutCenterCallback(object):
     prev_v = None
 
@@ -8,16 +14,47 @@ class PutCenterCallback(object):
         self.name = name
         self.corner = corner
         self.cb_name = cmd.get_unused_name('_cb')
+        # Set once the axes object is gone, so the callback is only removed once
+        self.removed = False
+        # Cached viewport and the corner offset computed from it
+        self.vp = None
+        self.vp_time = 0.0
+        self.off_key = None
+        self.off_c = None
 
     def load(self):
         cmd.load_callback(self, self.cb_name)
 
+    # Remove the callback. cmd.delete cannot be called while rendering, so the delete is
+    # queued with cmd.do and runs after the current frame
+    def remove(self):
+        if self.removed:
+            return
+        self.removed = True
+        cmd.do('delete ' + self.cb_name, log=0, echo=0)
+
+    # Offset of the axes from the view center, in camera space
+    def corner_offset(self, v):
+        now = time.perf_counter()
+        if self.vp is None or now - self.vp_time > VIEWPORT_REFRESH:
+            self.vp = cmd.get_viewport()
+            self.vp_time = now
+        key = (v[11], self.vp[0], self.vp[1])
+        if key != self.off_key:
+            off_c = [0.15 * v[11] * self.vp[0] / self.vp[1], 0.15 * v[11], 0.0]
+            if self.corner in [2,3]:
+                off_c[0] *= -1
+            if self.corner in [3,4]:
+                off_c[1] *= -1
+            self.off_key = key
+            self.off_c = off_c
+        return self.off_c
+
     def __call__(self):
-        if self.name not in cmd.get_names('objects'):
-            import threading
-            threading.Thread(None, cmd.delete, args=(self.cb_name,)).start()
+        if self.removed:
             return
 
+        # Only the view is read every frame. It is an 18 float tuple, so comparing it is cheap
         v = cmd.get_view()
         if v == self.prev_v:
             return
@@ -26,19 +63,18 @@ class PutCenterCallback(object):
         t = v[12:15]
 
         if self.corner:
-            vp = cmd.get_viewport()
             R_mc = [v[0:3], v[3:6], v[6:9]]
-            off_c = [0.15 * v[11] * vp[0] / vp[1], 0.15 * v[11], 0.0]
-            if self.corner in [2,3]:
-                off_c[0] *= -1
-            if self.corner in [3,4]:
-                off_c[1] *= -1
-            off_m = cpv.transform(R_mc, off_c)
+            off_m = cpv.transform(R_mc, self.corner_offset(v))
             t = cpv.add(t, off_m)
 
         z = -v[11] / 30.0
         m = [z, 0, 0, 0, 0, z, 0, 0, 0, 0, z, 0, t[0] / z, t[1] / z, t[2] / z, 1]
-        cmd.set_object_ttt(self.name, m)
+        # Setting the matrix fails once the axes object has been deleted, which is when the callback removes itself
+        try:
+            if cmd.is_error(cmd.set_object_ttt(self.name, m)):
+                self.remove()
+        except pymol.CmdException:
+            self.remove()
 
 def axes(name='axes'):
     '''
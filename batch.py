@@ -0,0 +1,205 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Offline batch pipeline: applies a transform recipe written by tt_dump to many structure files in parallel.
+#
+#   python -m pymolTransformTool.batch recipe.json 'structures/*.cif' -o moved/ --workers 32
+#
+# The recipe's accumulated matrix is the same one PymolObject builds from TotalRotation/TotalTranslation,
+# so every file is moved exactly as the object was moved in the tool.
+
+import argparse
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+# File extensions recognised as structure files
+STRUCTURE_EXTENSIONS = (".pdb", ".ent", ".cif", ".mmcif")
+
+# Read the 4x4 matrix for one object from a recipe file
+def loadRecipe(filename, objectName=None):
+    with open(filename) as file:
+        recipe = json.load(file)
+    objects = recipe["objects"]
+    if objectName is None:
+        if len(objects) != 1:
+            raise ValueError("recipe contains %d objects, choose one with --object" % len(objects))
+        objectName = next(iter(objects))
+    return np.array(objects[objectName]["matrix"], dtype=float)
+
+# Expand directories and glob patterns into a sorted list of structure files
+def findStructures(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = [os.path.join(path, name) for name in os.listdir(path)]
+        else:
+            candidates = glob.glob(path)
+        for candidate in candidates:
+            base = candidate[:-3] if candidate.endswith(".gz") else candidate
+            if base.lower().endswith(STRUCTURE_EXTENSIONS):
+                files.append(candidate)
+    return sorted(files)
+
+# Return the output path of each file, keeping its path relative to the deepest directory holding all the inputs,
+# so files with the same name in different directories do not overwrite each other
+def outputPaths(files, output):
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(source)) for source in files])
+    return [os.path.join(output, os.path.relpath(os.path.abspath(source), root)) for source in files]
+
+def openText(filename, mode):
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode + "t")
+    return open(filename, mode)
+
+# Transform the coordinates of PDB ATOM/HETATM records, keeping every other column untouched
+def transformPdbLines(lines, matrix):
+    indices = [i for i, line in enumerate(lines) if line.startswith(("ATOM  ", "HETATM"))]
+    if indices == []:
+        return 0
+    coords = np.array([(lines[i][30:38], lines[i][38:46], lines[i][46:54]) for i in indices], dtype=float)
+    coords = coords @ matrix[0:3, 0:3].T + matrix[0:3, 3]
+    for i, (x, y, z) in zip(indices, coords):
+        lines[i] = "%s%8.3f%8.3f%8.3f%s" % (lines[i][:30], x, y, z, lines[i][54:])
+    return len(indices)
+
+# One mmCIF value: a quoted string, which may contain its quote character when not followed by whitespace, or a
+# bare word. Splitting a line on it gives the whitespace and the values in turn
+CIF_VALUE = re.compile(r"""('(?:[^']|'(?=\S))*'(?=\s|$)|"(?:[^"]|"(?=\S))*"(?=\s|$)|\S+)""")
+
+# Transform the Cartn_x/y/z columns of the mmCIF atom_site loop. Values are read with quoting taken into account, so
+# rows may hold quoted names with spaces or be wrapped over several lines. Only the coordinates are rewritten, and the
+# whitespace after each one absorbs its change in width, so the other columns stay where they were when they fit
+def transformCifLines(lines, matrix):
+    columns = []
+    body = []
+    inLoop = False
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith("_atom_site."):
+            inLoop = True
+            columns.append(stripped.split()[0])
+        elif inLoop:
+            if stripped == "" or stripped == "#" or stripped.startswith(("loop_", "_", "data_")):
+                if body != []:
+                    break
+                inLoop = False
+                continue
+            body.append(i)
+    if body == []:
+        return 0
+    # Each line split into whitespace and values, and the line and position of every value of the loop in order,
+    # so each row is the next len(columns) values
+    parts = [CIF_VALUE.split(lines[i]) for i in body]
+    places = [(line, index) for line, part in enumerate(parts) for index in range(1, len(part), 2)]
+    count = len(places) // len(columns)
+    xyz = [columns.index("_atom_site.Cartn_" + axis) for axis in "xyz"]
+    places = [places[row * len(columns) + c] for row in range(count) for c in xyz]
+    coords = np.array([parts[line][index] for line, index in places], dtype=float).reshape(-1, 3)
+    coords = coords @ matrix[0:3, 0:3].T + matrix[0:3, 3]
+    for (line, index), value in zip(places, coords.flatten().tolist()):
+        part = parts[line]
+        old = part[index]
+        part[index] = "%.3f" % value
+        # The next value keeps its column, with at least one space before it
+        if index + 2 < len(part):
+            part[index + 1] = " " * max(1, len(part[index + 1]) + len(old) - len(part[index]))
+    for line in set(line for line, index in places):
+        lines[body[line]] = "".join(parts[line])
+    return count
+
+# Move one file with numpy and return its atom count
+def transformFileNumpy(source, target, matrix):
+    with openText(source, "r") as file:
+        lines = file.readlines()
+    base = source[:-3] if source.endswith(".gz") else source
+    if base.lower().endswith((".cif", ".mmcif")):
+        atoms = transformCifLines(lines, matrix)
+    else:
+        atoms = transformPdbLines(lines, matrix)
+    with openText(target, "w") as file:
+        file.writelines(lines)
+    return atoms
+
+# One PyMOL instance per worker process, created by the pool initializer
+pymolInstance = None
+
+def startPymol():
+    global pymolInstance
+    import pymol2
+    pymolInstance = pymol2.PyMOL()
+    pymolInstance.start()
+
+# Move one file with PyMOL and return its atom count
+def transformFilePymol(source, target, matrix):
+    cmd = pymolInstance.cmd
+    cmd.delete("all")
+    cmd.load(source, "structure")
+    cmd.transform_selection("structure", [float(value) for value in matrix.flatten()], state=0, homogenous=1)
+    cmd.save(target, "structure", state=0)
+    return cmd.count_atoms("structure")
+
+# Worker entry point. Returns (source, atom count, error message)
+def processFile(job):
+    source, target, matrix, engine = job
+    try:
+        if engine == "pymol":
+            atoms = transformFilePymol(source, target, matrix)
+        else:
+            atoms = transformFileNumpy(source, target, matrix)
+        return source, atoms, None
+    except Exception as error:
+        return source, 0, str(error)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a Transform Tool recipe (written by tt_dump) to many structure files.")
+    parser.add_argument("recipe", help="JSON recipe written by tt_dump")
+    parser.add_argument("inputs", nargs="+", help="structure files, directories or glob patterns")
+    parser.add_argument("-o", "--output", required=True, help="output directory")
+    parser.add_argument("--object", default=None, help="object in the recipe to use (default: the only one)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--engine", choices=["numpy", "pymol"], default="numpy", help="coordinate engine used by the workers")
+    args = parser.parse_args(argv)
+
+    matrix = loadRecipe(args.recipe, args.object)
+    files = findStructures(args.inputs)
+    if files == []:
+        print("No structure files found")
+        return 1
+    targets = outputPaths(files, args.output)
+    for directory in set(os.path.dirname(target) for target in targets):
+        os.makedirs(directory, exist_ok=True)
+    jobs = [(source, target, matrix, args.engine) for source, target in zip(files, targets)]
+
+    # Each worker process gets its own PyMOL instance when PyMOL is used
+    initializer = startPymol if args.engine == "pymol" else None
+    failures = 0
+    atoms = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers, initializer=initializer) as pool:
+        for done, (source, count, error) in enumerate(pool.imap_unordered(processFile, jobs, chunksize=4), 1):
+            if error is not None:
+                failures += 1
+                print("\n%s: %s" % (source, error), file=sys.stderr)
+            atoms += count
+            elapsed = time.perf_counter() - start
+            print("\r%d/%d files  %.1f files/s  %.0f atoms/s" % (done, len(jobs), done / elapsed, atoms / elapsed), end="", flush=True)
+    print()
+    elapsed = time.perf_counter() - start
+    print("Transformed %d files (%d atoms) in %.2f s with %d workers, %d failed" % (len(jobs) - failures, atoms, elapsed, args.workers, failures))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Performance benchmarks for the Transform Tool, run against the NumPy stand-in for pymol.cmd in stubcmd.py.
+#
+#   python benchmarks/run.py [--quick] [--only NAME] [--output results.json]
+#
+# Every case reports ops/sec, latency percentiles (in microseconds) and peak traced memory as JSON.
+# Cases that drive the dialog need PyQt5 and are skipped without it.
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stubcmd
+
+cmd, package = stubcmd.install()
+from pymolTransformTool import objects, commands, axes
+
+# A fresh session holding count objects of atoms atoms each
+def newSession(count, atoms, states=1):
+    cmd.reinitialize()
+    objects.objectList = None
+    for index in range(count):
+        cmd.add_object("obj%05d" % index, atoms, states, seed=index)
+    return objects.getObjectList()
+
+# A smooth back-and-forth slider trace of ticks integer values between -limit and limit
+def sliderTrace(ticks, limit):
+    return [int(round(limit * math.sin(2 * math.pi * tick / ticks))) for tick in range(1, ticks + 1)]
+
+# Each case is a function returning (setup, run). setup builds the session, run performs the timed
+# operations and yields once per operation so every operation's latency can be recorded
+
+def caseSliderDrag(atoms, ticks):
+    def setup():
+        objectList = newSession(1, atoms)
+        object = objectList.list[0]
+        object.checkForChanges()
+        return object
+    def run(object):
+        previous = 0
+        for value in sliderTrace(ticks, 180):
+            object.rotate("x", value - previous)
+            previous = value
+            yield
+        object.commit()
+        object.closeStep()
+        yield
+    return setup, run
+
+def caseObjectList(count):
+    def setup():
+        newSession(count, 10)
+        objects.objectList = None
+    def run(state):
+        objectList = objects.getObjectList()
+        yield
+        objectList.update()
+        yield
+        cmd.add_object("extra", 10)
+        objectList.update()
+        yield
+    return setup, run
+
+def caseBulkTransform(count, atoms):
+    def setup():
+        newSession(count, atoms)
+    def run(state):
+        commands.tt_transform("all", rx=10, ty=1)
+        yield
+        commands.tt_undo("all")
+        yield
+        commands.tt_reset("all")
+        yield
+    return setup, run
+
+def caseSnap(count, atoms):
+    def setup():
+        newSession(count + 1, atoms)
+    def run(state):
+        for repeat in range(5):
+            commands.tt_snap("obj00000", "all", match="order", quiet=1)
+            yield
+            commands.tt_undo("all")
+            yield
+    return setup, run
+
+def caseHistory(steps):
+    def setup():
+        objectList = newSession(1, 1000)
+        object = objectList.list[0]
+        object.checkForChanges()
+        for step in range(steps):
+            if step % 2:
+                object.rotate("xyz"[step % 3], 1.0)
+            else:
+                object.translate([0.1, 0.0, 0.0])
+            object.closeStep()
+        object.commit()
+        return object
+    def run(object):
+        for step in range(steps):
+            object.undo()
+            yield
+        for step in range(steps):
+            object.redo()
+            yield
+        object.undo(steps)
+        yield
+        object.reset()
+        yield
+    return setup, run
+
+def caseAxesCallback(frames):
+    def setup():
+        cmd.reinitialize()
+        axes.axes("axes")
+        return [object for object in cmd.objects.values() if object.kind == "callback"][0].callback
+    def run(callback):
+        for frame in range(frames):
+            angle = 2 * math.pi * frame / frames
+            view = list(cmd.view)
+            view[0:9] = [math.cos(angle), -math.sin(angle), 0.0, math.sin(angle), math.cos(angle), 0.0, 0.0, 0.0, 1.0]
+            cmd.set_view_raw(view)
+            callback()
+            yield
+    return setup, run
+
+def caseSocketStream(count, batches):
+    from pymolTransformTool import server, protocol
+    def setup():
+        newSession(count, 1000)
+        running = server.TransformServer("127.0.0.1:0")
+        running.start()
+        return running, protocol.TransformClient(running.address)
+    def run(state):
+        running, client = state
+        names = ["obj%05d" % index for index in range(count)]
+        for batch in range(batches):
+            matrix = np.array(protocol.spin(batch * 360.0 / batches)).reshape(4, 4)
+            client.sendBatch([(name, matrix) for name in names])
+            # Wait until the server has read the whole batch
+            while running.received < (batch + 1) * count:
+                time.sleep(0.0001)
+            yield
+        client.close()
+        # Stopping applies the last transforms and writes them to the coordinates
+        running.stop()
+        yield
+    return setup, run
+
+def caseDialogDrag(atoms, ticks):
+    from PyQt5 import QtWidgets
+    from pymolTransformTool import gui
+    application = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    def setup():
+        newSession(1, atoms)
+        gui.dialog = None
+        gui.run_plugin_gui()
+        return gui.transformToolInstance
+    def run(tool):
+        slider = tool.ui.xRotationSlider
+        slider.setSliderDown(True)
+        for value in sliderTrace(ticks, 180):
+            slider.setValue(value)
+            # Apply the frame straight away instead of waiting for the timer
+            tool.frameTimer.stop()
+            tool.applyFrame()
+            # Include the worker thread applying the frame
+            tool.worker.drain()
+            yield
+        slider.setSliderDown(False)
+        yield
+        application.processEvents()
+    return setup, run
+
+# All cases as (name, parameters, factory), in quick or full sizes
+def cases(quick):
+    atomSizes = [1000, 10000] if quick else [1000, 10000, 100000, 1000000]
+    objectCounts = [1, 100] if quick else [1, 100, 1000, 10000]
+    ticks = 200 if quick else 2000
+    historySteps = [100] if quick else [100, 1000, 5000]
+    result = []
+    for atoms in atomSizes:
+        result.append(("slider_drag", {"atoms": atoms, "ticks": ticks}, lambda atoms=atoms: caseSliderDrag(atoms, ticks)))
+    for count in objectCounts:
+        result.append(("object_list", {"objects": count}, lambda count=count: caseObjectList(count)))
+        result.append(("bulk_transform", {"objects": count, "atoms": 1000}, lambda count=count: caseBulkTransform(count, 1000)))
+        result.append(("snap", {"objects": count, "atoms": 50}, lambda count=count: caseSnap(count, 50)))
+    for steps in historySteps:
+        result.append(("history", {"steps": steps}, lambda steps=steps: caseHistory(steps)))
+    result.append(("axes_callback", {"frames": ticks * 5}, lambda: caseAxesCallback(ticks * 5)))
+    for count in objectCounts:
+        result.append(("socket_stream", {"objects": count, "batches": ticks}, lambda count=count: caseSocketStream(count, ticks)))
+    for atoms in atomSizes:
+        result.append(("dialog_drag", {"atoms": atoms, "ticks": ticks}, lambda atoms=atoms: caseDialogDrag(atoms, ticks)))
+    return result
+
+# Run one case, once for timing and once under tracemalloc for peak memory
+def measure(factory):
+    setup, run = factory()
+    state = setup()
+    latencies = []
+    start = time.perf_counter()
+    last = start
+    for _ in run(state):
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    total = time.perf_counter() - start
+    setup, run = factory()
+    state = setup()
+    tracemalloc.start()
+    for _ in run(state):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies = np.array(latencies) * 1e6
+    return {
+        "operations": len(latencies),
+        "seconds": total,
+        "ops_per_sec": len(latencies) / total if total > 0 else None,
+        "latency_us": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        },
+        "peak_memory_bytes": peak,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Transform Tool against a NumPy stand-in for PyMOL.")
+    parser.add_argument("--quick", action="store_true", help="use small sizes")
+    parser.add_argument("--only", default=None, help="only run cases whose name contains this text")
+    parser.add_argument("--output", default=None, help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, parameters, factory in cases(args.quick):
+        if args.only and args.only not in name:
+            continue
+        try:
+            result = measure(factory)
+        except ImportError as error:
+            result = {"skipped": str(error)}
+        result.update({"name": name, "parameters": parameters})
+        results.append(result)
+        print("%-16s %-32s %s" % (name, json.dumps(parameters), "skipped" if "skipped" in result else "%.0f ops/s, p99 %.0f us" % (result["ops_per_sec"], result["latency_us"]["p99"])), file=sys.stderr)
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Stand-in for pymol.cmd used by the benchmarks. Objects are NumPy coordinate arrays,
+# so the tool can be measured on a machine without PyMOL. Only the calls the tool makes are provided,
+# and selections are limited to object names joined with "or" (plus "all" and wildcards).
+
+import fnmatch
+import importlib.util
+import os
+import sys
+import types
+
+import numpy as np
+
+# Directory of the plugin, which is imported as the pymolTransformTool package
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class CmdException(Exception):
+    pass
+
+class StubObject:
+    def __init__(self, name, coords, kind="molecule"):
+        self.name = name
+        self.kind = kind
+        # (n_states, n_atoms, 3) float32 coordinates
+        self.coords = coords
+        self.ttt = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+        self.enabled = True
+
+class StubCmd:
+    DEFAULT_ERROR = -1
+
+    def __init__(self):
+        self.commands = {}
+        self.reinitialize()
+
+    # Start a new empty session
+    def reinitialize(self):
+        self.objects = {}
+        self.state = 1
+        self.view = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, -50.0, 0.0, 0.0, 0.0, 40.0, 60.0, -20.0)
+        self.viewport = (640, 480)
+        self.unused = 0
+
+    # Helpers used by the benchmarks to build sessions
+
+    def add_object(self, name, atoms, states=1, seed=0):
+        rng = np.random.default_rng(seed)
+        coords = (rng.standard_normal((states, atoms, 3)) * (atoms ** (1.0 / 3.0))).astype(np.float32)
+        self.objects[name] = StubObject(name, coords)
+
+    def set_view_raw(self, view):
+        self.view = tuple(view)
+
+    # Selections
+
+    def _names(self, selection):
+        selection = selection.strip()
+        while selection.startswith("(") and selection.endswith(")"):
+            selection = selection[1:-1].strip()
+        names = []
+        for token in selection.split(" or "):
+            token = token.strip().strip("()")
+            if token in ("all", "*"):
+                names.extend(name for name, object in self.objects.items() if object.kind == "molecule")
+            elif any(character in token for character in "*?["):
+                names.extend(fnmatch.filter(self.objects, token))
+            elif token in self.objects:
+                names.append(token)
+        # Atoms come back in object order, as in PyMOL
+        wanted = set(names)
+        return [name for name in self.objects if name in wanted]
+
+    def _state_index(self, object, state):
+        state = self.state if state in (-1, None) else state
+        return min(state, len(object.coords)) - 1
+
+    # The cmd API
+
+    def get_names(self, type="public_objects", enabled_only=0, selection=""):
+        names = self._names(selection) if selection else list(self.objects)
+        return [name for name in names if not int(enabled_only) or self.objects[name].enabled]
+
+    def get_object_list(self, selection="(all)"):
+        return self._names(selection)
+
+    def get_unused_name(self, prefix="tmp"):
+        self.unused += 1
+        return "%s%02d" % (prefix, self.unused)
+
+    def count_atoms(self, selection="(all)", quiet=1, state=0):
+        return sum(self.objects[name].coords.shape[1] for name in self._names(selection))
+
+    def count_states(self, selection="(all)", quiet=1):
+        return max([len(self.objects[name].coords) for name in self._names(selection)] or [0])
+
+    def get_coords(self, selection="all", state=1):
+        names = self._names(selection)
+        if names == []:
+            return None
+        if state == 0:
+            return np.concatenate([self.objects[name].coords.reshape(-1, 3) for name in names])
+        return np.concatenate([self.objects[name].coords[self._state_index(self.objects[name], state)] for name in names])
+
+    def load_coords(self, coords, selection, state=1):
+        start = 0
+        for name in self._names(selection):
+            object = self.objects[name]
+            end = start + object.coords.shape[1]
+            object.coords[self._state_index(object, state)] = coords[start:end]
+            start = end
+
+    def centerofmass(self, selection="(all)", state=-1, quiet=1):
+        coords = self.get_coords(selection, state)
+        return [float(value) for value in coords.mean(axis=0)]
+
+    def get_extent(self, selection="(all)", state=0, quiet=1):
+        coords = self.get_coords(selection, state)
+        return [[float(value) for value in coords.min(axis=0)], [float(value) for value in coords.max(axis=0)]]
+
+    def set_object_ttt(self, name, ttt, state=0, quiet=1, homogenous=0):
+        if name not in self.objects:
+            raise CmdException("object %s not found" % name)
+        self.objects[name].ttt = list(ttt)
+
+    def transform_object(self, name, matrix, state=1, log=0, homogenous=0):
+        object = self.objects[name]
+        matrix = np.array(matrix, dtype=float).reshape(4, 4)
+        states = range(len(object.coords)) if state == 0 else [self._state_index(object, state)]
+        for index in states:
+            object.coords[index] = object.coords[index] @ matrix[0:3, 0:3].T + matrix[0:3, 3]
+
+    def get_view(self, output=1, quiet=1):
+        return self.view
+
+    def get_viewport(self, output=1, quiet=1):
+        return self.viewport
+
+    def load_callback(self, callback, name):
+        self.objects[name] = StubObject(name, np.zeros((1, 0, 3), dtype=np.float32), "callback")
+        self.objects[name].callback = callback
+
+    def load_cgo(self, cgo, name, state=0):
+        self.objects[name] = StubObject(name, np.zeros((1, 0, 3), dtype=np.float32), "cgo")
+
+    def delete(self, name):
+        for target in self._names(name) if name != "all" else list(self.objects):
+            del self.objects[target]
+        self.objects.pop(name, None)
+
+    def do(self, command, log=1, echo=1, flush=0):
+        words = command.split(None, 1)
+        if words[0] == "delete":
+            self.delete(words[1])
+
+    def set(self, name, value, selection="", state=0, quiet=1):
+        pass
+
+    def is_error(self, result):
+        return isinstance(result, int) and result < 0
+
+    def extend(self, name, function):
+        self.commands[name] = function
+        return function
+
+# Install a StubCmd as pymol.cmd, with the pymol.cgo constants and chempy.cpv helpers used by axes.py, and import the plugin package.
+# Returns (cmd, package)
+def install():
+    cmd = StubCmd()
+    pymol = types.ModuleType("pymol")
+    pymol.cmd = cmd
+    pymol.CmdException = CmdException
+    sys.modules["pymol"] = pymol
+    sys.modules["pymol.cmd"] = cmd
+    cgo = types.ModuleType("pymol.cgo")
+    cgo.CYLINDER = 9.0
+    cgo.CONE = 27.0
+    pymol.cgo = cgo
+    sys.modules["pymol.cgo"] = cgo
+    chempy = types.ModuleType("chempy")
+    cpv = types.ModuleType("chempy.cpv")
+    cpv.add = lambda v1, v2: [v1[0] + v2[0], v1[1] + v2[1], v1[2] + v2[2]]
+    cpv.transform = lambda m, v: [m[0][0] * v[0] + m[0][1] * v[1] + m[0][2] * v[2],
+                                  m[1][0] * v[0] + m[1][1] * v[1] + m[1][2] * v[2],
+                                  m[2][0] * v[0] + m[2][1] * v[1] + m[2][2] * v[2]]
+    chempy.cpv = cpv
+    sys.modules["chempy"] = chempy
+    sys.modules["chempy.cpv"] = cpv
+    spec = importlib.util.spec_from_file_location("pymolTransformTool", os.path.join(PLUGIN_DIR, "__init__.py"), submodule_search_locations=[PLUGIN_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["pymolTransformTool"] = package
+    spec.loader.exec_module(package)
+    return cmd, package
@@ -0,0 +1,92 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Live clash counting for the Transform Tool.
+# The atoms that do not move are put in a cell list once, with cells as large as the clash distance,
+# so each query only compares the moving atoms with the atoms in the 27 cells around them
+
+import itertools
+
+import numpy as np
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+from . import transform
+
+# Atoms of different objects closer than this, in Angstroms, clash
+CLASH_DISTANCE = 2.5
+
+# The offsets of a cell and its 26 neighbours
+NEIGHBOURS = np.array(list(itertools.product((-1, 0, 1), repeat=3)))
+
+# Uniform grid of points, stored as the points sorted by cell and the range of each occupied cell
+class CellList:
+    def __init__(self, coords, size):
+        self.size = size
+        cells = np.floor(coords / size).astype(np.int64)
+        # Keep an empty border, so neighbours of any cell in the grid are in the grid too
+        self.origin = cells.min(axis=0) - 1 if len(coords) else np.zeros(3, dtype=np.int64)
+        cells -= self.origin
+        self.shape = cells.max(axis=0) + 2 if len(coords) else np.ones(3, dtype=np.int64)
+        keys = self.keys(cells)
+        order = np.argsort(keys, kind="stable")
+        self.coords = np.ascontiguousarray(coords[order], dtype=np.float32)
+        self.cellKeys, self.starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self.counts = counts
+
+    def keys(self, cells):
+        return (cells[:, 0] * self.shape[1] + cells[:, 1]) * self.shape[2] + cells[:, 2]
+
+    # Return the indices of the points within distance of any grid point, and their number of such pairs
+    def query(self, points, distance):
+        if len(self.cellKeys) == 0:
+            return np.zeros(0, dtype=np.int64), 0
+        cells = np.floor(points / self.size).astype(np.int64) - self.origin
+        # Every point paired with each of its 27 neighbouring cells, all at once
+        neighbours = (cells[:, np.newaxis, :] + NEIGHBOURS[np.newaxis]).reshape(-1, 3)
+        inside = np.all((neighbours >= 0) & (neighbours < self.shape), axis=1)
+        keys = self.keys(neighbours)
+        found = np.searchsorted(self.cellKeys, keys)
+        found[found == len(self.cellKeys)] = 0
+        occupied = np.nonzero(inside & (self.cellKeys[found] == keys))[0]
+        # Expand each occupied neighbour cell into the range of grid points in it
+        starts = self.starts[found[occupied]]
+        counts = self.counts[found[occupied]]
+        pairPoints = np.repeat(occupied // len(NEIGHBOURS), counts)
+        pairGrid = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        difference = points[pairPoints] - self.coords[pairGrid]
+        hits = pairPoints[np.einsum("ij,ij->i", difference, difference) < distance * distance]
+        return np.unique(hits), len(hits)
+
+# Counts clashes between an entry of the object list and the other enabled objects while it is moved.
+# For a selection, the objects holding it are left out of the environment.
+# The environment is read once; each count only transforms the moving atoms by the entry's pending matrix
+class ClashMonitor:
+    def __init__(self, object, distance=CLASH_DISTANCE):
+        self.object = object
+        self.distance = distance
+        # The moving atoms at the committed transform of the entry when the monitor was built
+        self.coords = cmd.get_coords(object.name, state=-1)
+        if self.coords is None:
+            self.coords = np.zeros((0, 3), dtype=np.float32)
+        self.baseMatrix = object.committedMatrix.copy()
+        # The rest of the objects holding a moving selection is left out, since its atoms are bonded to the selection
+        environment = cmd.get_coords("enabled and not (byobject (%s))" % object.name, state=-1)
+        if environment is None:
+            environment = np.zeros((0, 3), dtype=np.float32)
+        self.cells = CellList(environment, distance)
+
+    # Return (clashing atom pairs, moving atoms that clash) for the entry's transform matrix, by default its current one
+    def count(self, matrix=None):
+        if matrix is None:
+            matrix = self.object.matrix
+        step = matrix @ transform.invert(self.baseMatrix)
+        points = self.coords @ step[0:3, 0:3].T.astype(np.float32) + step[0:3, 3].astype(np.float32)
+        atoms, pairs = self.cells.query(points, self.distance)
+        return pairs, len(atoms)
@@ -0,0 +1,533 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Scripting commands for the Transform Tool. These do not use Qt, so they work in headless PyMOL (pymol -cq)
+
+import functools
+import json
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+# The transform engine (and numpy) is only imported when a command is first used, so registering the commands is cheap
+def engine():
+    from . import objects
+    return objects
+
+# Wrap a command so it holds the engine lock while it runs, keeping the streaming server from changing the objects meanwhile
+def locked(function):
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        with engine().lock:
+            return function(*args, **kwargs)
+    return run
+
+# Return the tool's objects for every PyMOL object matched by the selection,
+# or with atoms=1 a single entry moving only the selected atoms
+def resolveObjects(selection, atoms=0):
+    if int(atoms):
+        entry = engine().getObjectList().getSelection(selection)
+        return [] if entry is None else [entry]
+    byName = engine().getObjectList().byName
+    objects = []
+    for name in cmd.get_object_list("(" + selection + ")") or []:
+        if name in byName:
+            # Pick up changes made outside the tool since the last command, without keeping a snapshot for reset
+            byName[name].checkForChanges(snapshot=False)
+            objects.append(byName[name])
+    return objects
+
+def tt_transform(objects="all", rx=0.0, ry=0.0, rz=0.0, tx=0.0, ty=0.0, tz=0.0, group=0, atoms=0, quiet=1):
+    '''
+DESCRIPTION
+
+    Rotates (in degrees, about the x, y and z axes in that order) and then
+    translates (in Angstroms) objects, as one undo step per object.
+    Each object rotates about its own center of mass, or with group=1 all
+    objects move together about their shared center of mass. With atoms=1,
+    objects is a selection and only the selected atoms are moved, such as
+    "chain B and resi 100-250".
+
+USAGE
+
+    tt_transform [ objects [, rx [, ry [, rz [, tx [, ty [, tz [, group [, atoms ]]]]]]]]]
+    '''
+    rotation = [float(rx), float(ry), float(rz)]
+    translation = [float(tx), float(ty), float(tz)]
+    targets = resolveObjects(objects, atoms)
+    if targets == []:
+        print(" tt_transform: no objects found")
+        return
+    # A group moves as one rigid body and writes all coordinates at once
+    if int(group) and len(targets) > 1:
+        targets = [engine().PymolObjectGroup(targets)]
+    for object in targets:
+        object.move(rotation, translation)
+    # Write all coordinates at once
+    if len(targets) == 1:
+        targets[0].commit()
+    else:
+        engine().getObjectList().commitMany(targets)
+    if not int(quiet):
+        print(" tt_transform: moved %d object(s)" % len(targets))
+
+def tt_undo(objects="all", steps=1, atoms=0, quiet=1):
+    '''
+DESCRIPTION
+
+    Undoes the last steps of the Transform Tool on objects, or with atoms=1
+    on a selection moved with tt_transform atoms=1.
+
+USAGE
+
+    tt_undo [ objects [, steps [, atoms ]]]
+    '''
+    targets = resolveObjects(objects, atoms)
+    for object in targets:
+        object.undo(int(steps))
+    engine().getObjectList().commitMany(targets)
+
+def tt_redo(objects="all", steps=1, atoms=0, quiet=1):
+    '''
+DESCRIPTION
+
+    Redoes steps of the Transform Tool that were undone on objects, or with
+    atoms=1 on a selection.
+
+USAGE
+
+    tt_redo [ objects [, steps [, atoms ]]]
+    '''
+    targets = resolveObjects(objects, atoms)
+    for object in targets:
+        object.redo(int(steps))
+    engine().getObjectList().commitMany(targets)
+
+def tt_reset(objects="all", atoms=0, quiet=1):
+    '''
+DESCRIPTION
+
+    Moves objects (or with atoms=1 the atoms of a selection) back to where
+    they were before the Transform Tool moved them, and clears their history.
+
+USAGE
+
+    tt_reset [ objects [, atoms ]]
+    '''
+    engine().getObjectList().resetMany(resolveObjects(objects, atoms))
+
+def tt_offset_all(tx=0.0, ty=0.0, tz=0.0, quiet=1):
+    '''
+DESCRIPTION
+
+    Translates every object known to the Transform Tool by the same vector
+    (in Angstroms), as one undo step per object. All transforms are updated
+    in one pass and all coordinates written at once.
+
+USAGE
+
+    tt_offset_all [ tx [, ty [, tz ]]]
+    '''
+    from . import transform
+    translation = [float(tx), float(ty), float(tz)]
+    engine().getObjectList().transformAll(transform.translationMatrix(translation), translation)
+
+def tt_reset_all(quiet=1):
+    '''
+DESCRIPTION
+
+    Moves every object and atom selection back to where it was before the
+    Transform Tool moved it and clears all histories. Objects are written
+    with one bulk write of the coordinates.
+
+USAGE
+
+    tt_reset_all
+    '''
+    engine().getObjectList().resetAll()
+
+def tt_export_all(filename, quiet=1):
+    '''
+DESCRIPTION
+
+    Writes the accumulated transform of every object to filename, as a
+    JSON recipe (like tt_dump) or, for names ending in .npz, as arrays of
+    names, 4x4 matrices and slider totals.
+
+USAGE
+
+    tt_export_all filename
+    '''
+    import numpy as np
+    names, matrices, totals = engine().getObjectList().exportAll()
+    if filename.endswith(".npz"):
+        with open(filename, "wb") as file:
+            np.savez(file, names=np.array(names, dtype=str), matrices=matrices, totals=totals)
+    else:
+        recipe = {"version": 1, "objects": {}}
+        for name, matrix, objectTotals in zip(names, matrices.tolist(), totals.tolist()):
+            recipe["objects"][name] = {"TotalRotation": objectTotals[0:3], "TotalTranslation": objectTotals[3:6], "matrix": matrix}
+        with open(filename, "w") as file:
+            json.dump(recipe, file, indent=1)
+    if not int(quiet):
+        print(" tt_export_all: exported %d object(s)" % len(names))
+
+def tt_export_coords(filename, objects="all", chunk=65536, quiet=1):
+    '''
+DESCRIPTION
+
+    Writes the coordinates of objects, with the Transform Tool's transforms
+    applied, to one file. Coordinates are read and written in chunks of at
+    most chunk atoms, so memory use does not grow with the size of the
+    session. The format follows the extension: .pdb or .cif (optionally
+    gzipped) for every state as models, .npy for all coordinates as one
+    float32 array, or .npz for that array with object names and atom and
+    state counts.
+
+USAGE
+
+    tt_export_coords filename [, objects [, chunk ]]
+    '''
+    from . import export
+    targets = resolveObjects(objects)
+    export.exportCoordinates(filename, targets, int(chunk))
+    if not int(quiet):
+        print(" tt_export_coords: exported %d object(s)" % len(targets))
+
+def tt_dump(objects="all", filename="", quiet=0):
+    '''
+DESCRIPTION
+
+    Prints the accumulated transform of objects, and optionally writes it as a
+    JSON recipe that can be applied to other structures.
+
+USAGE
+
+    tt_dump [ objects [, filename ]]
+    '''
+    recipe = {"version": 1, "objects": {}}
+    for object in resolveObjects(objects):
+        recipe["objects"][object.name] = {
+            "TotalRotation": list(object.TotalRotation),
+            "TotalTranslation": list(object.TotalTranslation),
+            "matrix": object.matrix.tolist(),
+        }
+        if not int(quiet):
+            print(" %s: rotation %s translation %s" % (object.name, object.TotalRotation, object.TotalTranslation))
+    if filename:
+        with open(filename, "w") as file:
+            json.dump(recipe, file, indent=1)
+    return recipe
+
+def tt_all_states(objects="all", enable=1, quiet=1):
+    '''
+DESCRIPTION
+
+    Makes the Transform Tool move every state of objects (trajectories, NMR
+    ensembles) instead of only the current state. Undo and reset follow the
+    same mode.
+
+USAGE
+
+    tt_all_states [ objects [, enable ]]
+    '''
+    for object in resolveObjects(objects):
+        object.setAllStates(bool(int(enable)))
+
+def tt_save_session(filename, quiet=1):
+    '''
+DESCRIPTION
+
+    Writes the transform and undo history of every object to a binary .npz
+    file, which tt_load_session restores in a later PyMOL session.
+
+USAGE
+
+    tt_save_session filename
+    '''
+    from . import session
+    objectList = engine().getObjectList()
+    session.saveSession(filename, objectList)
+    if not int(quiet):
+        print(" tt_save_session: saved %d object(s)" % len(objectList.list))
+
+def tt_load_session(filename, quiet=1):
+    '''
+DESCRIPTION
+
+    Restores the transforms and undo histories written by tt_save_session
+    onto the loaded objects with the same names. The objects are moved
+    straight to their saved transform in one bulk write.
+
+USAGE
+
+    tt_load_session filename
+    '''
+    from . import session
+    count = session.loadSession(filename, engine().getObjectList())
+    if not int(quiet):
+        print(" tt_load_session: restored %d object(s)" % count)
+
+def tt_keyframe(objects="all", clear=0, quiet=1):
+    '''
+DESCRIPTION
+
+    Captures the current transform of objects as their next animation
+    keyframe, or with clear=1 removes their keyframes.
+
+USAGE
+
+    tt_keyframe [ objects [, clear ]]
+    '''
+    from . import animation
+    for object in resolveObjects(objects):
+        if int(clear):
+            object.keyframes = []
+        else:
+            animation.addKeyframe(object)
+        if not int(quiet):
+            print(" %s: %d keyframe(s)" % (object.name, len(object.keyframes)))
+
+def tt_animate(object, frames=30, mode="states", interpolation="linear", name="", quiet=1):
+    '''
+DESCRIPTION
+
+    Builds a movie through the keyframes captured with tt_keyframe, with
+    frames steps between keyframes. Rotations are interpolated with
+    quaternion slerp and the path of the object's center linearly or with a
+    spline. With mode=states the frames are the states of a new object;
+    with mode=matrix they are stored as object matrix keys of the object.
+
+USAGE
+
+    tt_animate object [, frames [, mode [, interpolation [, name ]]]]
+    '''
+    from . import animation
+    targets = resolveObjects(object)
+    if targets == []:
+        print(" tt_animate: no objects found")
+        return
+    name = name or cmd.get_unused_name(targets[0].name + "_movie")
+    count = animation.animate(targets[0], int(frames), name, mode == "states", interpolation == "spline")
+    if not int(quiet):
+        print(" tt_animate: built %d frames" % count)
+
+def tt_copies(object, count=2, name="", split=0, quiet=1):
+    '''
+DESCRIPTION
+
+    Builds count copies of an object for oligomers and helical assemblies.
+    Copy 0 is the object before the Transform Tool moved it, and each further
+    copy is moved once more by the object's accumulated transform. The copies
+    are the states of one new object, or separate objects with split=1.
+
+USAGE
+
+    tt_copies object [, count [, name [, split ]]]
+    '''
+    from . import copies
+    targets = resolveObjects(object)
+    if targets == []:
+        print(" tt_copies: no objects found")
+        return
+    name = name or cmd.get_unused_name(targets[0].name + "_copies")
+    copies.symmetricCopies(targets[0], int(count), name, bool(int(split)))
+    if not int(quiet):
+        print(" tt_copies: built %d copies as %s" % (int(count), name))
+
+def tt_lattice(object, na=2, nb=2, nc=2, name="", split=0, quiet=1):
+    '''
+DESCRIPTION
+
+    Builds a na x nb x nc grid of copies of an object at its current
+    position. The cell edges are the object's x, y and z translation in the
+    Transform Tool, and an axis without translation uses the size of the
+    object along it. The copies are the states of one new object, or
+    separate objects with split=1.
+
+USAGE
+
+    tt_lattice object [, na [, nb [, nc [, name [, split ]]]]]
+    '''
+    from . import copies
+    targets = resolveObjects(object)
+    if targets == []:
+        print(" tt_lattice: no objects found")
+        return
+    counts = [int(na), int(nb), int(nc)]
+    name = name or cmd.get_unused_name(targets[0].name + "_lattice")
+    copies.latticeCopies(targets[0], counts, name, bool(int(split)))
+    if not int(quiet):
+        print(" tt_lattice: built %d copies as %s" % (counts[0] * counts[1] * counts[2], name))
+
+def tt_clashes(objects="all", distance=2.5, atoms=0, quiet=0):
+    '''
+DESCRIPTION
+
+    Counts the atoms of objects (or with atoms=1 of a selection) closer than
+    distance (in Angstroms) to atoms of the other enabled objects. For a
+    selection, the rest of the objects holding it is not counted, since it
+    is bonded to the selection. The dialog's "Clashes" check box shows the
+    same count live while moving.
+
+USAGE
+
+    tt_clashes [ objects [, distance [, atoms ]]]
+    '''
+    from .clashes import ClashMonitor
+    counts = {}
+    for object in resolveObjects(objects, atoms):
+        object.commit()
+        pairs, clashing = ClashMonitor(object, float(distance)).count()
+        counts[object.name] = clashing
+        if not int(quiet):
+            print(" %s: %d atoms in %d clashes" % (object.name, clashing, pairs))
+    return counts
+
+def tt_snap(target, objects="all", selection="all", match="ids", quiet=0):
+    '''
+DESCRIPTION
+
+    Snaps objects onto target: each object is moved by the rigid transform
+    that best superposes its atoms in selection on the matching atoms of
+    target (a least-squares Kabsch fit, solved for all objects at once).
+    Each move is one undo step and updates the object's slider totals.
+    Atom matches are cached, so repeated snaps of many poses are fast.
+
+USAGE
+
+    tt_snap target [, objects [, selection [, match ]]]
+
+ARGUMENTS
+
+    match = ids (segi, chain, resi and name, default), names (resn and
+    name, for ligand poses numbered differently) or order (atom order)
+    '''
+    from . import fit
+    objectList = engine().getObjectList()
+    # Objects holding the target are not moved
+    excluded = set(cmd.get_object_list("(" + target + ")") or [])
+    targets = [object for object in resolveObjects(objects) if object.name not in excluded]
+    rmsd = fit.snap(objectList, targets, fit.getTarget(target, match), selection)
+    if not int(quiet):
+        if rmsd == {}:
+            print(" tt_snap: no objects with at least %d matching atoms" % fit.MIN_ATOMS)
+        else:
+            values = list(rmsd.values())
+            print(" tt_snap: fitted %d object(s), RMSD %.3f to %.3f (mean %.3f)" % (len(values), min(values), max(values), sum(values) / len(values)))
+    return rmsd
+
+def tt_fast_drag(lines=50000, trace=200000, quiet=1):
+    '''
+DESCRIPTION
+
+    Sets the atom counts above which objects are shown as a lightweight proxy
+    while a slider of the Transform Tool is dragged: all atoms as lines, or a
+    CA/P trace as ribbon. A count of 0 turns that proxy off.
+
+USAGE
+
+    tt_fast_drag [ lines [, trace ]]
+    '''
+    levels = engine().FAST_DRAG_LEVELS
+    levels[:] = []
+    if int(trace) > 0:
+        levels.append((int(trace), "name CA+P", "ribbon"))
+    if int(lines) > 0:
+        levels.append((int(lines), "all", "lines"))
+    levels.sort(reverse=True)
+
+def tt_profile(action="report", filename="", quiet=1):
+    '''
+DESCRIPTION
+
+    Controls the Transform Tool's instrumentation, which counts and times
+    every PyMOL call made by the tool and records latency histograms of
+    slider events, commits and undo history updates. Disabled
+    instrumentation has no overhead.
+
+USAGE
+
+    tt_profile [ action [, filename ]]
+
+ARGUMENTS
+
+    action = on, off, reset or report (default). report prints the tables,
+    or writes them as JSON when filename is given.
+    '''
+    from . import instrument
+    if action == "on":
+        instrument.enable()
+    elif action == "off":
+        instrument.disable()
+    elif action == "reset":
+        instrument.reset()
+    elif filename:
+        instrument.export(filename)
+    else:
+        instrument.printReport()
+
+def tt_server(action="start", address="127.0.0.1:7777", quiet=0):
+    '''
+DESCRIPTION
+
+    Starts or stops a local server through which external programs, such
+    as docking or simulation tools, stream object transforms into the
+    Transform Tool. Streamed objects move once per frame, and each pause in
+    the stream becomes one undo step. Clients use
+    pymolTransformTool.protocol.TransformClient.
+
+USAGE
+
+    tt_server [ action [, address ]]
+
+ARGUMENTS
+
+    action = start (default), stop or status
+
+    address = host:port, port, or unix:/path for a Unix domain socket.
+    Port 0 picks a free port {default: 127.0.0.1:7777}
+    '''
+    from . import server
+    if action == "start" and server.server is None:
+        server.server = server.TransformServer(address)
+        server.server.start()
+    elif action == "stop" and server.server is not None:
+        server.server.stop()
+        server.server = None
+    if not int(quiet):
+        if server.server is None:
+            print(" tt_server: stopped")
+        else:
+            running = server.server
+            if not running.thread.is_alive():
+                print(" tt_server: the server thread has ended, use tt_server stop to clean up")
+                return
+            print(" tt_server: listening on %s, %d update(s) received, %d applied, %d rejected" % (running.address, running.received, running.applied, running.rejected))
+
+cmd.extend('tt_transform', locked(tt_transform))
+cmd.extend('tt_undo', locked(tt_undo))
+cmd.extend('tt_redo', locked(tt_redo))
+cmd.extend('tt_reset', locked(tt_reset))
+cmd.extend('tt_offset_all', locked(tt_offset_all))
+cmd.extend('tt_reset_all', locked(tt_reset_all))
+cmd.extend('tt_export_all', locked(tt_export_all))
+cmd.extend('tt_export_coords', locked(tt_export_coords))
+cmd.extend('tt_dump', locked(tt_dump))
+cmd.extend('tt_all_states', locked(tt_all_states))
+cmd.extend('tt_save_session', locked(tt_save_session))
+cmd.extend('tt_load_session', locked(tt_load_session))
+cmd.extend('tt_keyframe', locked(tt_keyframe))
+cmd.extend('tt_animate', locked(tt_animate))
+cmd.extend('tt_copies', locked(tt_copies))
+cmd.extend('tt_lattice', locked(tt_lattice))
+cmd.extend('tt_clashes', locked(tt_clashes))
+cmd.extend('tt_snap', locked(tt_snap))
+cmd.extend('tt_fast_drag', locked(tt_fast_drag))
+cmd.extend('tt_profile', locked(tt_profile))
+cmd.extend('tt_server', locked(tt_server))
@@ -0,0 +1,66 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Symmetric copies and lattices built from an object's transform.
+# The coordinates of every copy are computed in one batched numpy operation and loaded as the states
+# of a single object, which PyMOL can split into separate objects in one call
+
+import numpy as np
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+from . import transform
+
+# Return the matrices matrix^0 ... matrix^(count - 1) as a (count, 4, 4) array
+def powerMatrices(matrix, count):
+    matrices = np.empty((count, 4, 4))
+    matrices[0] = transform.identity()
+    for index in range(1, count):
+        matrices[index] = matrix @ matrices[index - 1]
+    return matrices
+
+# Return the translations of an na x nb x nc grid with cell edges a, b and c along x, y and z, as a (na * nb * nc, 4, 4) array
+def gridMatrices(counts, edges):
+    p, q, r = np.meshgrid(np.arange(counts[0]), np.arange(counts[1]), np.arange(counts[2]), indexing="ij")
+    matrices = np.tile(transform.identity(), (p.size, 1, 1))
+    matrices[:, 0:3, 3] = np.stack([p.ravel(), q.ravel(), r.ravel()], axis=1) * np.asarray(edges, dtype=float)
+    return matrices
+
+# Apply each matrix to the (n_atoms, 3) coordinates, giving an (n_matrices, n_atoms, 3) array
+def transformCopies(coords, matrices):
+    rotations = matrices[:, 0:3, 0:3].astype(np.float32)
+    translations = matrices[:, 0:3, 3].astype(np.float32)
+    return np.matmul(coords[np.newaxis], rotations.transpose(0, 2, 1)) + translations[:, np.newaxis, :]
+
+# Load the copies as the states of a new object named name, or with split as objects name_0001, name_0002, ...
+def loadCopies(source, name, copies, split=False):
+    cmd.create(name, source, source_state=cmd.get_state(), target_state=1, zoom=0)
+    for index, coords in enumerate(copies):
+        cmd.load_coordset(coords, name, state=index + 1)
+    if split:
+        cmd.split_states(name, prefix=name + "_")
+        cmd.delete(name)
+
+# Make count copies of object, copy k moved k times by its accumulated transform, starting from its original position
+def symmetricCopies(object, count, name, split=False):
+    object.commit()
+    coords = cmd.get_coords(object.name, state=-1)
+    # Start from the coordinates before any of the tool's transforms
+    original = transform.invert(object.committedMatrix)
+    coords = (coords @ original[0:3, 0:3].T + original[0:3, 3]).astype(np.float32)
+    loadCopies(object.name, name, transformCopies(coords, powerMatrices(object.matrix, count)), split)
+
+# Make a grid of copies of object at its current position. The cell edges are the object's x, y and z translation
+# in the tool, and an axis without translation uses the size of the object along it
+def latticeCopies(object, counts, name, split=False):
+    object.commit()
+    coords = cmd.get_coords(object.name, state=-1).astype(np.float32)
+    size = coords.max(axis=0) - coords.min(axis=0)
+    edges = [translation if translation != 0 else extent for translation, extent in zip(object.TotalTranslation, size)]
+    loadCopies(object.name, name, transformCopies(coords, gridMatrices(counts, edges)), split)
@@ -0,0 +1,153 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Streaming export of the transformed coordinates of many objects.
+# Coordinates are read from PyMOL in chunks of at most CHUNK_ATOMS atoms of one object and one state and written
+# straight away, so memory use depends on the chunk size and not on the size of the session. The objects are committed
+# first, so the coordinates read hold every transform and no object matrix is applied on top of them
+
+import zipfile
+
+import numpy as np
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+from .batch import openText
+from .objects import getObjectList
+
+# Largest number of atoms read from PyMOL at once
+CHUNK_ATOMS = 65536
+
+# Atom properties read with cmd.iterate for the text formats
+ATOM_PROPERTIES = "rows.append((type, name, alt, resn, chain, resi, resv, segi, elem, q, b))"
+
+PDB_ATOM = "%-6s%5d %-4s%1s%-3s %1s%4d%1s   %8.3f%8.3f%8.3f%6.2f%6.2f      %-4s%2s\n"
+
+CIF_COLUMNS = ["group_PDB", "id", "type_symbol", "label_atom_id", "label_alt_id", "label_comp_id", "label_asym_id",
+    "label_seq_id", "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z", "occupancy", "B_iso_or_equiv",
+    "pdbx_PDB_model_num"]
+
+# Yield the coordinates of one state of an object in chunks, as (coords, atom properties) with the
+# properties left empty unless asked for
+def chunks(object, state, chunkAtoms, properties=False):
+    count = cmd.count_atoms(object.name)
+    for first in range(1, count + 1, chunkAtoms):
+        # Atom indices are numbered from 1 within each object
+        selection = "%s and index %d-%d" % (object.name, first, min(first + chunkAtoms - 1, count))
+        coords = cmd.get_coords(selection, state=state)
+        if coords is None:
+            return
+        rows = []
+        if properties:
+            cmd.iterate(selection, ATOM_PROPERTIES, space={"rows": rows})
+        yield coords, rows
+
+# Insertion code of a residue identifier such as "100A"
+def insertionCode(resi):
+    return resi[-1] if resi != "" and resi[-1].isalpha() else ""
+
+# PDB atom names of one-letter elements start in the second column
+def pdbAtomName(name, elem):
+    return name if len(name) >= 4 or len(elem) == 2 else " " + name
+
+# Quote mmCIF values that would otherwise not be read back as one token
+def cifValue(value):
+    if value == "":
+        return "."
+    if " " in value or value[0] in "'\"_#$;[]":
+        return "'%s'" % value if "'" not in value else '"%s"' % value
+    return value
+
+# Write the objects as PDB, with one MODEL per state when any object has more than one
+def writePdb(file, objects, chunkAtoms):
+    states = [cmd.count_states(object.name) for object in objects]
+    models = max(states + [0])
+    for state in range(1, models + 1):
+        if models > 1:
+            file.write("MODEL     %4d\n" % state)
+        serial = 0
+        for object, count in zip(objects, states):
+            if state > count:
+                continue
+            for coords, rows in chunks(object, state, chunkAtoms, properties=True):
+                lines = []
+                for (x, y, z), (type, name, alt, resn, chain, resi, resv, segi, elem, q, b) in zip(coords.tolist(), rows):
+                    serial += 1
+                    lines.append(PDB_ATOM % (type, serial % 100000, pdbAtomName(name, elem)[:4], alt[:1], resn[:3],
+                        chain[:1], resv % 10000, insertionCode(resi), x, y, z, q, b, segi[:4], elem[:2].upper()))
+                file.write("".join(lines))
+            file.write("TER\n")
+        if models > 1:
+            file.write("ENDMDL\n")
+    file.write("END\n")
+
+# Write the objects as one mmCIF atom_site loop, with states as model numbers
+def writeCif(file, objects, chunkAtoms):
+    file.write("data_export\n#\nloop_\n")
+    file.write("".join("_atom_site.%s\n" % column for column in CIF_COLUMNS))
+    serial = 0
+    for object in objects:
+        for state in range(1, cmd.count_states(object.name) + 1):
+            for coords, rows in chunks(object, state, chunkAtoms, properties=True):
+                lines = []
+                for (x, y, z), (type, name, alt, resn, chain, resi, resv, segi, elem, q, b) in zip(coords.tolist(), rows):
+                    serial += 1
+                    lines.append("%s %d %s %s %s %s %s %d %s %.3f %.3f %.3f %.2f %.2f %d\n" % (type, serial,
+                        cifValue(elem), cifValue(name), cifValue(alt), cifValue(resn), cifValue(chain), resv,
+                        cifValue(insertionCode(resi)), x, y, z, q, b, state))
+                file.write("".join(lines))
+    file.write("#\n")
+
+# Write the coordinates of every state of every object, in that order, as one (atoms, 3) float32 .npy array
+def writeNpy(file, objects, chunkAtoms):
+    counts = [(cmd.count_atoms(object.name), cmd.count_states(object.name)) for object in objects]
+    # The header needs the final shape, which is known before any coordinates are read
+    rows = sum(atoms * states for atoms, states in counts)
+    np.lib.format.write_array_header_1_0(file, {"descr": np.dtype("<f4").str, "fortran_order": False, "shape": (rows, 3)})
+    for object, (atoms, states) in zip(objects, counts):
+        for state in range(1, states + 1):
+            for coords, _ in chunks(object, state, chunkAtoms):
+                file.write(np.ascontiguousarray(coords, dtype="<f4").tobytes())
+    return counts
+
+# Write the coordinates as an uncompressed .npz holding the coords array of writeNpy, streamed into the archive,
+# with the object names and the atom and state counts needed to split it
+def writeNpz(filename, objects, chunkAtoms):
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        with archive.open("coords.npy", "w", force_zip64=True) as member:
+            counts = writeNpy(member, objects, chunkAtoms)
+        arrays = {
+            "names": np.array([object.name for object in objects], dtype=str),
+            "atoms": np.array([atoms for atoms, states in counts], dtype=np.int64),
+            "states": np.array([states for atoms, states in counts], dtype=np.int64),
+        }
+        for key, array in arrays.items():
+            with archive.open(key + ".npy", "w") as member:
+                np.lib.format.write_array(member, array, allow_pickle=False)
+
+# Write the transformed coordinates of objects to filename, choosing the format from its extension:
+# .pdb, .cif or .mmcif (optionally gzipped), .npy or .npz. Pending transforms of the objects are committed first
+def exportCoordinates(filename, objects, chunkAtoms=CHUNK_ATOMS):
+    if objects != []:
+        getObjectList().commitMany(objects)
+    base = filename[:-3] if filename.endswith(".gz") else filename
+    extension = base.lower().rsplit(".", 1)[-1]
+    if extension == "npz":
+        writeNpz(filename, objects, chunkAtoms)
+    elif extension == "npy":
+        with open(filename, "wb") as file:
+            writeNpy(file, objects, chunkAtoms)
+    elif extension in ("cif", "mmcif"):
+        with openText(filename, "w") as file:
+            writeCif(file, objects, chunkAtoms)
+    elif extension in ("pdb", "ent"):
+        with openText(filename, "w") as file:
+            writePdb(file, objects, chunkAtoms)
+    else:
+        raise ValueError("unknown export format: " + filename)
@@ -0,0 +1,156 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Snap to target: superposes objects onto a target selection by matched atoms with a batched Kabsch fit.
+# The target's atom keys and centered coordinates, and each object's mapping of atoms onto the target, are cached,
+# so fitting many candidate poses reads one block of coordinates and solves every fit in a few numpy calls
+
+import numpy as np
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+from . import transform
+
+# Fewest matched atoms that fix a rigid transform
+MIN_ATOMS = 3
+
+# Atom properties that identify matching atoms, for each match mode. "order" matches atoms by position instead
+MATCH_KEYS = {
+    "ids": "keys.append((segi, chain, resi, name))",
+    "names": "keys.append((resn, name))",
+}
+
+# Return the selection of the named objects, restricted to selection unless it is all atoms
+def restrict(names, selection):
+    objects = "(" + " or ".join(names) + ")"
+    if selection.strip() in ("all", "(all)", ""):
+        return objects
+    return objects + " and (" + selection + ")"
+
+# Return one key per atom of selection, in atom order
+def atomKeys(selection, match):
+    if match == "order":
+        return list(range(cmd.count_atoms(selection)))
+    keys = []
+    cmd.iterate(selection, MATCH_KEYS[match], space={"keys": keys})
+    return keys
+
+# Return the rigid transforms ((n, 4, 4) array) that best move each of mobile ((n, atoms, 3) array) onto target
+# ((atoms, 3) array, centered on targetCenter), and the RMSD after each fit
+def kabsch(mobile, target, targetCenter):
+    mobileCenter = mobile.mean(axis=1)
+    centered = mobile - mobileCenter[:, None, :]
+    covariance = np.einsum("nai,aj->nij", centered, target)
+    u, s, vt = np.linalg.svd(covariance)
+    # Flip the last axis where needed, so every result is a rotation and not a reflection
+    sign = np.sign(np.linalg.det(vt.transpose(0, 2, 1) @ u.transpose(0, 2, 1)))
+    sign[sign == 0] = 1.0
+    vt[:, 2, :] *= sign[:, None]
+    rotations = vt.transpose(0, 2, 1) @ u.transpose(0, 2, 1)
+    matrices = np.tile(np.identity(4), (len(mobile), 1, 1))
+    matrices[:, 0:3, 0:3] = rotations
+    matrices[:, 0:3, 3] = targetCenter - np.einsum("nij,nj->ni", rotations, mobileCenter)
+    # Residual from the singular values, without transforming the coordinates
+    residual = (centered ** 2).sum(axis=(1, 2)) + (target ** 2).sum() - 2.0 * (s[:, 0] + s[:, 1] + sign * s[:, 2])
+    rmsd = np.sqrt(np.maximum(residual, 0.0) / target.shape[0])
+    return matrices, rmsd
+
+class SnapTarget:
+    def __init__(self, selection, match="ids"):
+        self.selection = selection
+        self.match = match
+        self.keys = atomKeys(selection, match)
+        # Row of each key in the target, keeping the first atom with a repeated key
+        self.rowOf = {}
+        for row, key in enumerate(self.keys):
+            self.rowOf.setdefault(key, row)
+        # (atom count, selection) and (mobile indices, target rows) of each object, by name
+        self.mappings = {}
+        self.coords = None
+        # Centered target coordinates and their center, for each set of matched target rows
+        self.centered = {}
+
+    # Read the target coordinates, which may have moved since the last fit. The coordinates read include the object
+    # matrix, so the tool's objects holding the target are committed first, as commitMany does for its own reads
+    def refresh(self, objectList):
+        names = cmd.get_object_list("(" + self.selection + ")") or []
+        objectList.commitMany([objectList.get(name) for name in names if objectList.get(name) is not None])
+        self.coords = cmd.get_coords(self.selection, state=-1)
+        self.centered = {}
+
+    # Return the matched target rows centered on their own center, and that center
+    def centeredRows(self, rows):
+        key = rows.tobytes()
+        if key not in self.centered:
+            coords = self.coords[rows]
+            center = coords.mean(axis=0)
+            self.centered[key] = (coords - center, center)
+        return self.centered[key]
+
+    # Return (mobile indices, target rows) matching the selected atoms of object onto the target
+    def mapping(self, object, selection):
+        atoms = object.atomCount()
+        cached = self.mappings.get(object.name)
+        if cached is not None and cached[0] == (atoms, selection):
+            return cached[1]
+        keys = atomKeys(restrict([object.name], selection), self.match)
+        pairs = [(index, self.rowOf[key]) for index, key in enumerate(keys) if key in self.rowOf]
+        pairs = np.array(pairs, dtype=np.intp).reshape(-1, 2)
+        result = (len(keys), pairs[:, 0], pairs[:, 1])
+        self.mappings[object.name] = ((atoms, selection), result)
+        return result
+
+# Snap targets by selection and match mode, so mappings are kept between fits
+targets = {}
+
+# Return the cached snap target for selection, rebuilding it if its atoms changed
+def getTarget(selection, match="ids"):
+    target = targets.get((selection, match))
+    if target is None or len(target.keys) != cmd.count_atoms(selection):
+        target = SnapTarget(selection, match)
+        targets[(selection, match)] = target
+    return target
+
+# Superpose each object's atoms in selection onto target, as one undo step per object that also moves its
+# slider totals. Returns the RMSD of each fitted object by name; objects with too few matched atoms are left alone
+def snap(objectList, objects, target, selection="all"):
+    target.refresh(objectList)
+    mappings = {object.name: target.mapping(object, selection) for object in objects}
+    objects = [object for object in objects if len(mappings[object.name][1]) >= MIN_ATOMS]
+    if objects == []:
+        return {}
+    # Read the selected atoms of every object at once, in PyMOL's object order, with their pending transforms
+    # written first so the coordinates read are the ones shown
+    objectList.commitMany(list(objects))
+    order = {name: index for index, name in enumerate(cmd.get_names())}
+    objects.sort(key=lambda object: order[object.name])
+    counts = np.array([mappings[object.name][0] for object in objects])
+    coords = cmd.get_coords(restrict([object.name for object in objects], selection), state=-1)
+    if coords is None or len(coords) != counts.sum():
+        coords = np.concatenate([cmd.get_coords(restrict([object.name], selection), state=-1) for object in objects])
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    # Objects matching the same target rows are solved together
+    groups = {}
+    for index, object in enumerate(objects):
+        groups.setdefault(mappings[object.name][2].tobytes(), []).append(index)
+    steps = np.empty((len(objects), 4, 4))
+    rmsd = np.empty(len(objects))
+    pivots = np.empty((len(objects), 3))
+    for members in groups.values():
+        targetRows = mappings[objects[members[0]].name][2]
+        centered, center = target.centeredRows(targetRows)
+        mobile = np.stack([coords[offsets[index]:offsets[index + 1]][mappings[objects[index].name][1]] for index in members])
+        steps[members], rmsd[members] = kabsch(mobile, centered, center)
+        pivots[members] = mobile.mean(axis=1)
+    # The sliders show the fit as rotations about the object's center followed by a translation
+    for index, object in enumerate(objects):
+        if object.center is not None:
+            pivots[index] = object.center
+    objectList.transformEach(objects, steps, transform.totalsDeltas(steps, pivots))
+    return {object.name: float(value) for object, value in zip(objects, rmsd)}
@@ -0,0 +1,382 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+import time
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+# Import Qt modules
+from PyQt5 import QtCore, QtWidgets
+
+# Import the UI generated from TransformTool.ui
+from .TransformToolUI import Ui_Form
+
+# Import the transform engine
+from .objects import getObjectList, PymolObjectGroup, PymolSelection
+from .clashes import ClashMonitor
+
+# Import the worker that runs transforms off the GUI thread
+from .worker import CommandWorker
+
+# Import the optional instrumentation
+from . import instrument
+
+# Interval used to coalesce slider events into one transform per display frame, in milliseconds
+FRAME_INTERVAL = 16
+
+# global reference to avoid garbage collection
+dialog = None
+ui = None
+objectList = None
+transformToolInstance = None
+
+def run_plugin_gui():
+    global dialog
+    global ui
+    global objectList
+    global transformToolInstance
+    # Check if cmd.get_names() is empty
+    if cmd.get_names() == []:
+        print("No objects found, please load an object to use the Transform Tool")
+        return
+    # Check if dialog already exists, if not create a new one. It is kept and reused after it is closed
+    if dialog is None:
+        # create a new Window using the Ui_Form class
+        dialog = QtWidgets.QDialog()
+        ui = Ui_Form()
+        ui.setupUi(dialog)
+        # Get the object list shared with the scripting commands
+        objectList = getObjectList()
+        # Instantiate transformTool
+        transformToolInstance = TransformTool(objectList, ui)
+    # Otherwise pick up objects that were added, removed or renamed while it was hidden
+    else:
+        transformToolInstance.updateSelectionList()
+    # Check if dialog was successfully created, then show it and bring it to the front
+    if dialog is not None:
+        dialog.show()
+        dialog.raise_()
+        dialog.activateWindow()
+
+class TransformTool:
+    def __init__(self, pymolObjectList, ui):
+        self.pymolObjectList = pymolObjectList
+        self.ui = ui
+        self.currentObject = self.pymolObjectList.currentSelection
+        self.currentObject.checkForChanges()
+        self.translationLimit = self.ui.positionSpinBox.value()
+        # Timer that applies the pending slider values at most once per display frame
+        self.frameTimer = QtCore.QTimer()
+        self.frameTimer.setSingleShot(True)
+        self.frameTimer.setInterval(FRAME_INTERVAL)
+        self.frameTimer.timeout.connect(self.applyFrame)
+        # Time of the first slider event of the pending frame, only recorded while instrumentation is enabled
+        self.frameStart = None
+        # Slider frames are applied by a worker thread, so slow transforms never block the dialog
+        self.worker = CommandWorker()
+        self.worker.applied.connect(self.frameApplied)
+        # Clash counter for the current object, only built while the "Clashes" check box is checked
+        self.clashMonitor = None
+        # Fill the selectionComboBox once, then keep it up to date with the changes reported by the object list
+        self.fillSelectionList()
+        self.pymolObjectList.addListener(self.objectsChanged)
+
+        # Hookup callback functions for ui elements
+        self.ui.xRotationSlider.valueChanged.connect(self.scheduleFrame)
+        self.ui.yRotationSlider.valueChanged.connect(self.scheduleFrame)
+        self.ui.zRotationSlider.valueChanged.connect(self.scheduleFrame)
+        self.ui.xTranslationSlider.valueChanged.connect(self.scheduleFrame)
+        self.ui.yTranslationSlider.valueChanged.connect(self.scheduleFrame)
+        self.ui.zTranslationSlider.valueChanged.connect(self.scheduleFrame)
+        self.ui.xRotationSlider.sliderPressed.connect(self.sliderPressed)
+        self.ui.yRotationSlider.sliderPressed.connect(self.sliderPressed)
+        self.ui.zRotationSlider.sliderPressed.connect(self.sliderPressed)
+        self.ui.xTranslationSlider.sliderPressed.connect(self.sliderPressed)
+        self.ui.yTranslationSlider.sliderPressed.connect(self.sliderPressed)
+        self.ui.zTranslationSlider.sliderPressed.connect(self.sliderPressed)
+        self.ui.xRotationSlider.sliderReleased.connect(self.sliderReleased)
+        self.ui.yRotationSlider.sliderReleased.connect(self.sliderReleased)
+        self.ui.zRotationSlider.sliderReleased.connect(self.sliderReleased)
+        self.ui.xTranslationSlider.sliderReleased.connect(self.sliderReleased)
+        self.ui.yTranslationSlider.sliderReleased.connect(self.sliderReleased)
+        self.ui.zTranslationSlider.sliderReleased.connect(self.sliderReleased)
+        self.ui.selectionComboBox.currentTextChanged.connect(self.changeSelection)
+        #self.ui.selectionComboBox.highlighted.connect(self.updateSelectionList)
+        self.ui.positionSpinBox.valueChanged.connect(self.positionSpinBoxChanged)
+        self.ui.resetButton.clicked.connect(self.reset)
+        self.ui.undoButton.clicked.connect(self.undo)
+        self.ui.redoButton.clicked.connect(self.redo)
+        self.ui.groupButton.clicked.connect(self.group)
+        self.ui.allStatesCheckBox.toggled.connect(self.allStatesToggled)
+        self.ui.clashCheckBox.toggled.connect(self.clashesToggled)
+        # when dialog is closed, cleanup
+        dialog.finished.connect(self.cleanup)
+    
+    # Fill the selectionComboBox with every object and group in the list
+    def fillSelectionList(self):
+        # Lock the currentTextChanged signal from the selectionComboBox
+        self.ui.selectionComboBox.blockSignals(True)
+        # Clear the selectionComboBox and add all entries in one call
+        self.ui.selectionComboBox.clear()
+        self.ui.selectionComboBox.addItems([object.name for object in self.pymolObjectList.entries()])
+        # Set the current selection to the current object
+        self.ui.selectionComboBox.setCurrentText(self.currentObject.name)
+        # Unlock the currentTextChanged signal from the selectionComboBox
+        self.ui.selectionComboBox.blockSignals(False)
+
+    # Update the list of objects. Any changes are passed to objectsChanged
+    def updateSelectionList(self):
+        self.pymolObjectList.update()
+
+    # Patch the selectionComboBox with the entries that were added, removed or renamed
+    def objectsChanged(self, added, removed, renamed):
+        start = time.perf_counter() if instrument.enabled else None
+        comboBox = self.ui.selectionComboBox
+        # Lock the currentTextChanged signal from the selectionComboBox
+        comboBox.blockSignals(True)
+        for entry in removed:
+            comboBox.removeItem(comboBox.findText(entry.name, QtCore.Qt.MatchExactly))
+        for entry, oldName in renamed:
+            comboBox.setItemText(comboBox.findText(oldName, QtCore.Qt.MatchExactly), entry.name)
+        # New objects go after the existing objects, new groups after the existing groups, and new selections at the end
+        objects = [entry.name for entry in added if not isinstance(entry, (PymolObjectGroup, PymolSelection))]
+        if objects != []:
+            comboBox.insertItems(len(self.pymolObjectList.list) - len(objects), objects)
+        groups = [entry.name for entry in added if isinstance(entry, PymolObjectGroup)]
+        if groups != []:
+            comboBox.insertItems(len(self.pymolObjectList.list) + len(self.pymolObjectList.groups) - len(groups), groups)
+        for entry in added:
+            if isinstance(entry, PymolSelection):
+                comboBox.addItem(entry.name)
+        # Select another object if the current one was removed
+        if self.currentObject in removed and self.pymolObjectList.list != []:
+            self.frameTimer.stop()
+            self.worker.drain()
+            self.currentObject = self.pymolObjectList.list[0]
+            self.currentObject.checkForChanges()
+            self.updateClashMonitor()
+            self.updateSliders()
+        # Set the current selection to the current object
+        comboBox.setCurrentText(self.currentObject.name)
+        # Unlock the currentTextChanged signal from the selectionComboBox
+        comboBox.blockSignals(False)
+        if start is not None:
+            instrument.recordEvent("selection_list_update", time.perf_counter() - start)
+    
+    # Change selectionComboBox to new selection
+    def changeSelection(self):
+        # Write the previous object's transform to its coordinates
+        self.finishFrames()
+        self.commit()
+        # Set the current object to the current selection
+        self.currentObject = self.pymolObjectList.entryAt(self.ui.selectionComboBox.currentIndex())
+        # Drop the cached center if the object was changed while it was not selected
+        self.currentObject.checkForChanges()
+        self.updateClashMonitor()
+        # Update the sliders
+        self.updateSliders()
+
+    def blockSliderSignals(self, boolVal):
+        # set the blockSignals property of each slider to the value of boolVal
+        self.ui.xRotationSlider.blockSignals(boolVal)
+        self.ui.yRotationSlider.blockSignals(boolVal)
+        self.ui.zRotationSlider.blockSignals(boolVal)
+        self.ui.xTranslationSlider.blockSignals(boolVal)
+        self.ui.yTranslationSlider.blockSignals(boolVal)
+        self.ui.zTranslationSlider.blockSignals(boolVal)
+    
+    # Update the sliders to match the current object's total rotation and translation
+    def updateSliders(self):
+        # Block the signals from the sliders so they don't trigger their callbacks. Cast the values to ints to avoid floating point errors
+        self.blockSliderSignals(True)
+        self.ui.xRotationSlider.setValue(int(self.currentObject.TotalRotation[0]))
+        self.ui.yRotationSlider.setValue(int(self.currentObject.TotalRotation[1]))
+        self.ui.zRotationSlider.setValue(int(self.currentObject.TotalRotation[2]))
+        self.ui.xTranslationSlider.setValue(int(self.currentObject.TotalTranslation[0] * 100 / self.translationLimit))
+        self.ui.yTranslationSlider.setValue(int(self.currentObject.TotalTranslation[1] * 100 / self.translationLimit))
+        self.ui.zTranslationSlider.setValue(int(self.currentObject.TotalTranslation[2] * 100 / self.translationLimit))
+        # Unblock the signals from the sliders
+        self.blockSliderSignals(False)
+        # Show whether the current object transforms all its states
+        self.ui.allStatesCheckBox.blockSignals(True)
+        self.ui.allStatesCheckBox.setChecked(self.currentObject.allStates)
+        self.ui.allStatesCheckBox.blockSignals(False)
+        self.showClashes()
+
+    # callback for the "Position" spin box
+    def positionSpinBoxChanged(self):
+        # Reset the object using the reset function
+        self.reset()
+        # Update the translationLimit
+        self.translationLimit = self.ui.positionSpinBox.value()
+        # lock the signals from the translation sliders
+        self.blockSliderSignals(True)
+        # Update the translation sliders
+        self.ui.xTranslationSlider.setValue(self.ui.xTranslationSlider.value())
+        self.ui.yTranslationSlider.setValue(self.ui.yTranslationSlider.value())
+        self.ui.zTranslationSlider.setValue(self.ui.zTranslationSlider.value())
+        # unlock the signals from the translation sliders
+        self.blockSliderSignals(False)
+    
+    # Returns True if any slider is being dragged
+    def isDragging(self):
+        return (self.ui.xRotationSlider.isSliderDown() or self.ui.yRotationSlider.isSliderDown() or self.ui.zRotationSlider.isSliderDown()
+                or self.ui.xTranslationSlider.isSliderDown() or self.ui.yTranslationSlider.isSliderDown() or self.ui.zTranslationSlider.isSliderDown())
+
+    # callback for all sliders. Slider values are only read when the frame timer fires, so a fast drag costs one transform per frame
+    def scheduleFrame(self):
+        if not self.frameTimer.isActive():
+            self.frameTimer.start()
+            if instrument.enabled:
+                self.frameStart = time.perf_counter()
+
+    # Queue the latest slider values. The worker applies them as a preview through the object matrix
+    def applyFrame(self):
+        # The timer can fire while the GUI thread waits for the worker, so the frame is left for after the wait
+        if self.worker.draining:
+            self.frameTimer.start()
+            return
+        rotation = [float(self.ui.xRotationSlider.value()), float(self.ui.yRotationSlider.value()), float(self.ui.zRotationSlider.value())]
+        translation = [self.ui.xTranslationSlider.value() * self.translationLimit / 100,
+                       self.ui.yTranslationSlider.value() * self.translationLimit / 100,
+                       self.ui.zTranslationSlider.value() * self.translationLimit / 100]
+        # Changes made without dragging (keyboard, clicks on the slider groove) are committed straight away
+        self.worker.submit(self.currentObject, rotation, translation, not self.isDragging(), self.frameStart)
+        self.frameStart = None
+
+    # Called on the GUI thread when the worker has applied a frame, with the object's matrix after it.
+    # The worker may already be moving the object again, so the object's own matrix is not read here
+    def frameApplied(self, object, matrix, started):
+        # Record the time from the first slider event to the applied frame
+        if started is not None:
+            instrument.recordEvent("slider_event", time.perf_counter() - started)
+        if self.clashMonitor is not None and self.clashMonitor.object is object:
+            self.showClashes(matrix)
+
+    # Queue slider values still waiting for the frame timer
+    def flushFrame(self):
+        if self.frameTimer.isActive():
+            self.frameTimer.stop()
+            self.applyFrame()
+
+    # Apply every queued frame before the GUI thread changes the objects itself
+    def finishFrames(self):
+        self.flushFrame()
+        self.worker.drain()
+
+    # callback for when a slider is pressed. Large objects are shown as a lightweight proxy during the drag
+    def sliderPressed(self):
+        self.worker.drain()
+        self.currentObject.startFastDrag()
+
+    # callback for when a slider is released
+    def sliderReleased(self):
+        start = time.perf_counter() if instrument.enabled else None
+        # Apply the last values, then commit the drag as a single step and show the object in place of its proxy
+        self.flushFrame()
+        self.worker.submit(self.currentObject, commit=True)
+        if start is not None:
+            instrument.recordEvent("slider_release", time.perf_counter() - start)
+
+    # Write the current object's transform to its coordinates and end its undo step
+    def commit(self):
+        self.worker.drain()
+        self.currentObject.commit()
+        self.currentObject.closeStep()
+
+    # callback for the "Reset" button
+    def reset(self):
+        # Reset the object
+        self.finishFrames()
+        self.currentObject.reset()
+        self.commit()
+        # Update the sliders
+        self.updateSliders()
+    
+    # callback for the "Undo" button
+    def undo(self):
+        # Undo the last action
+        self.finishFrames()
+        self.currentObject.undo()
+        self.commit()
+        # Update the sliders
+        self.updateSliders()
+    
+    # callback for the "Redo" button
+    def redo(self):
+        # Redo the last action
+        self.finishFrames()
+        self.currentObject.redo()
+        self.commit()
+        # Update the sliders
+        self.updateSliders()
+
+    # callback for the "All states" check box
+    def allStatesToggled(self, checked):
+        self.finishFrames()
+        self.currentObject.setAllStates(checked)
+
+    # callback for the "Clashes" check box
+    def clashesToggled(self, checked):
+        self.updateClashMonitor()
+        self.showClashes()
+
+    # Index the atoms around the current object, so clashes can be counted while it moves
+    def updateClashMonitor(self):
+        if not self.ui.clashCheckBox.isChecked():
+            self.clashMonitor = None
+            self.ui.clashLabel.setText("")
+            return
+        # The environment is read from the coordinates, so every transform has to be written first
+        self.finishFrames()
+        self.pymolObjectList.commitMany(self.pymolObjectList.list)
+        self.currentObject.commit()
+        self.clashMonitor = ClashMonitor(self.currentObject)
+
+    # Show the number of clashes of the current object at matrix, or at its current position once the worker is idle
+    def showClashes(self, matrix=None):
+        if self.clashMonitor is None:
+            return
+        pairs, atoms = self.clashMonitor.count(matrix)
+        self.ui.clashLabel.setText("%d atoms in %d clashes" % (atoms, pairs))
+
+    # callback for the "Group" button
+    def group(self):
+        # Ask which objects to move together, starting from the enabled objects
+        enabled = " ".join(name for name in cmd.get_names("objects", enabled_only=1) if name != "Axes")
+        text, ok = QtWidgets.QInputDialog.getText(dialog, "Group", "Objects to move together, or atoms to move (chain B and resi 100-250):", text=enabled)
+        if not ok:
+            return
+        # Write the previous object's transform to its coordinates
+        self.finishFrames()
+        self.commit()
+        # Select the group, or the selected atoms if the text is not a list of objects
+        self.pymolObjectList.update()
+        if all(name in self.pymolObjectList.byName for name in text.split()):
+            group = self.pymolObjectList.setMultiSelection(text.split())
+        else:
+            group = self.pymolObjectList.getSelection(text.strip())
+        if group is None:
+            return
+        self.currentObject = group
+        self.currentObject.checkForChanges()
+        self.updateClashMonitor()
+        self.ui.selectionComboBox.blockSignals(True)
+        self.ui.selectionComboBox.setCurrentText(group.name)
+        self.ui.selectionComboBox.blockSignals(False)
+        self.updateSliders()
+
+    # callback for when the dialog is closed. The dialog itself is kept for the next time the tool is opened
+    def cleanup(self):
+        # Write the current object's transform to its coordinates
+        self.finishFrames()
+        self.commit()
+        # Release the reset snapshots
+        for object in self.pymolObjectList.list:
+            object.releaseSnapshot()
@@ -0,0 +1,211 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Bounded undo/redo history for the Transform Tool.
+# Each step is a fixed-width record in a ring buffer that grows up to the capacity, and the accumulated
+# transform is checkpointed every CHECKPOINT_INTERVAL steps, so the state at any point
+# in the history is found by composing at most CHECKPOINT_INTERVAL small matrices.
+
+import numpy as np
+
+from . import transform
+
+# Maximum number of steps kept per object. The oldest steps are evicted first
+HISTORY_CAPACITY = 1000
+# Number of steps between stored checkpoints
+CHECKPOINT_INTERVAL = 32
+# Number of records allocated on the first step. The buffer doubles as steps are added
+INITIAL_RECORDS = 4
+
+# Record kinds
+ROTATE = 0
+TRANSLATE = 1
+MATRIX = 2
+
+# Axis names, indexed by the axis stored in a record
+AXIS_NAMES = ["x", "y", "z"]
+
+# Record layout: kind, axis, then either the value (angle, or translation vector) and rotation center,
+# or the top three rows of a general rigid transform followed by the change it makes to the slider totals
+RECORD_WIDTH = 20
+KIND = 0
+AXIS = 1
+VALUE = slice(2, 5)
+CENTER = slice(5, 8)
+MATRIX_ROWS = slice(2, 14)
+MATRIX_TOTALS = slice(14, 20)
+
+# Return the matrix of a single step
+def stepMatrix(record):
+    if record[KIND] == ROTATE:
+        return transform.aboutPoint(transform.rotationMatrix(AXIS_NAMES[int(record[AXIS])], record[2]), record[CENTER])
+    if record[KIND] == TRANSLATE:
+        return transform.translationMatrix(record[VALUE])
+    matrix = transform.identity()
+    matrix[0:3, :] = record[MATRIX_ROWS].reshape(3, 4)
+    return matrix
+
+# Add the slider totals of a single step to totals, a [rx, ry, rz, tx, ty, tz] array.
+# General transforms move the sliders only by the change stored with them
+def addStepTotals(totals, record):
+    if record[KIND] == ROTATE:
+        totals[int(record[AXIS])] += record[2]
+    elif record[KIND] == TRANSLATE:
+        totals[3:6] += record[VALUE]
+    else:
+        totals += record[MATRIX_TOTALS]
+
+class TransformHistory:
+    def __init__(self, capacity=HISTORY_CAPACITY, interval=CHECKPOINT_INTERVAL):
+        self.capacity = capacity
+        self.interval = interval
+        # Arrays are allocated on the first step, so objects that are never moved cost nothing
+        self.records = None
+        self.checkpointMatrices = None
+        self.checkpointTotals = None
+        self.clear()
+
+    # Forget every step. The given state becomes the oldest reachable state
+    def clear(self, matrix=None, totals=None):
+        self.baseMatrix = transform.identity() if matrix is None else matrix.copy()
+        self.baseTotals = np.zeros(6) if totals is None else np.array(totals, dtype=float)
+        # Absolute indices of the oldest kept step, the current position, and the end of the redo steps
+        self.start = 0
+        self.position = 0
+        self.end = 0
+        # Whether further steps of the same kind are merged into the last record
+        self.stepOpen = False
+
+    # Make room for at least size records, doubling the buffers up to the capacity and keeping the kept steps
+    # and their checkpoints
+    def reserve(self, size):
+        length = 0 if self.records is None else len(self.records)
+        if size <= length:
+            return
+        newLength = max(INITIAL_RECORDS, length)
+        while newLength < size:
+            newLength *= 2
+        newLength = min(newLength, self.capacity)
+        records = np.zeros((newLength, RECORD_WIDTH))
+        checkpointMatrices = np.zeros((newLength // self.interval + 2, 4, 4))
+        checkpointTotals = np.zeros((newLength // self.interval + 2, 6))
+        if length > 0:
+            kept = np.arange(self.start, self.end)
+            records[kept % newLength] = self.records[kept % length]
+            first = -(-self.start // self.interval) * self.interval
+            slots = np.arange(first, self.end + 1, self.interval) // self.interval
+            checkpointMatrices[slots % len(checkpointMatrices)] = self.checkpointMatrices[slots % len(self.checkpointMatrices)]
+            checkpointTotals[slots % len(checkpointTotals)] = self.checkpointTotals[slots % len(self.checkpointTotals)]
+        self.records = records
+        self.checkpointMatrices = checkpointMatrices
+        self.checkpointTotals = checkpointTotals
+
+    def canUndo(self):
+        return self.position > self.start
+
+    def canRedo(self):
+        return self.position < self.end
+
+    # End the current step, so the next action gets its own record
+    def closeStep(self):
+        self.stepOpen = False
+
+    # Record a step. matrix and totals are the state before the step, used for checkpoints
+    def push(self, kind, axis, value, center, matrix, totals):
+        # Merge into the last record if it is part of the same step
+        if self.stepOpen and self.position > self.start:
+            last = self.records[(self.position - 1) % len(self.records)]
+            if last[KIND] == kind and kind != MATRIX and (kind == TRANSLATE or last[AXIS] == axis):
+                last[VALUE] += value
+                self.end = self.position
+                return
+        # A new step discards the redo steps
+        self.end = self.position
+        # Evict the oldest step if the history is full, or make room for one more
+        if self.end - self.start == self.capacity:
+            oldest = self.records[self.start % len(self.records)]
+            self.baseMatrix = stepMatrix(oldest) @ self.baseMatrix
+            addStepTotals(self.baseTotals, oldest)
+            self.start += 1
+        else:
+            self.reserve(self.end - self.start + 1)
+        # Store a checkpoint of the state before every interval-th step
+        if self.position % self.interval == 0:
+            slot = (self.position // self.interval) % len(self.checkpointMatrices)
+            self.checkpointMatrices[slot] = matrix
+            self.checkpointTotals[slot] = totals
+        record = self.records[self.position % len(self.records)]
+        record[:] = 0.0
+        record[KIND] = kind
+        record[AXIS] = axis
+        record[VALUE] = value
+        record[CENTER] = center
+        self.position += 1
+        self.end = self.position
+        self.stepOpen = True
+
+    # Record a general rigid transform as a step of its own. delta is the change it makes to the slider totals
+    def pushMatrix(self, step, matrix, totals, delta=None):
+        self.closeStep()
+        self.push(MATRIX, 0, [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], matrix, totals)
+        record = self.records[(self.position - 1) % len(self.records)]
+        record[MATRIX_ROWS] = step[0:3, :].flatten()
+        if delta is not None:
+            record[MATRIX_TOTALS] = delta
+        self.closeStep()
+
+    # Return (matrix, totals) after the first position steps
+    def state(self, position):
+        # Start from the last checkpoint at or before position. Checkpoints are only valid for stored steps
+        first = (position // self.interval) * self.interval
+        if first >= self.end and first > self.start:
+            first -= self.interval
+        if first >= self.start and first < self.end:
+            slot = (first // self.interval) % len(self.checkpointMatrices)
+            matrix = self.checkpointMatrices[slot].copy()
+            totals = self.checkpointTotals[slot].copy()
+        else:
+            first = self.start
+            matrix = self.baseMatrix.copy()
+            totals = self.baseTotals.copy()
+        # Compose the remaining steps
+        for index in range(first, position):
+            record = self.records[index % len(self.records)]
+            matrix = stepMatrix(record) @ matrix
+            addStepTotals(totals, record)
+        return matrix, totals
+
+    # Move to position, clamped to the kept steps, and return the state there
+    def goto(self, position):
+        self.closeStep()
+        self.position = min(max(position, self.start), self.end)
+        return self.state(self.position)
+
+    # The kept steps and the checkpoints stored for them, oldest first, for saving
+    def export(self):
+        if self.records is None:
+            return np.zeros((0, RECORD_WIDTH)), np.zeros((0, 4, 4)), np.zeros((0, 6))
+        records = self.records[np.arange(self.start, self.end) % len(self.records)]
+        first = -(-self.start // self.interval) * self.interval
+        slots = (np.arange(first, self.end, self.interval) // self.interval) % len(self.checkpointMatrices)
+        return records, self.checkpointMatrices[slots], self.checkpointTotals[slots]
+
+    # Replace the history with steps and checkpoints returned by export
+    def restore(self, start, position, end, baseMatrix, baseTotals, records, checkpointMatrices, checkpointTotals):
+        self.clear(baseMatrix, baseTotals)
+        if len(records) == 0:
+            return
+        self.reserve(end - start)
+        self.records[np.arange(start, end) % len(self.records)] = records
+        first = -(-start // self.interval) * self.interval
+        slots = (np.arange(first, end, self.interval) // self.interval) % len(self.checkpointMatrices)
+        self.checkpointMatrices[slots] = checkpointMatrices
+        self.checkpointTotals[slots] = checkpointTotals
+        self.start = start
+        self.position = position
+        self.end = end
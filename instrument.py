@@ -0,0 +1,175 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Optional instrumentation of the Transform Tool's hot paths.
+# When enabled, the cmd used by the tool's modules is replaced by a proxy that counts and times every
+# call, and a few methods are wrapped to record latency histograms. When disabled, the original cmd and
+# methods are put back, so there is no overhead at all.
+
+import json
+import math
+import sys
+import time
+
+# Modules whose cmd calls are timed
+MODULES = ["objects", "gui", "axes", "commands"]
+
+# Methods timed as events: (module, class, method, event name).
+# Qt signals hold bound methods, so the dialog records its own events with recordEvent instead
+TIMED_METHODS = [
+    ("objects", "PymolObject", "commit", "commit"),
+    ("history", "TransformHistory", "push", "history_push"),
+    ("history", "TransformHistory", "goto", "history_jump"),
+    ("axes", "PutCenterCallback", "__call__", "axes_callback"),
+]
+
+# Number of power-of-two microsecond buckets in each histogram
+BUCKETS = 32
+
+enabled = False
+# cmd call name -> [count, seconds]
+callStats = {}
+# event name -> [count, seconds, bucket counts]
+eventStats = {}
+# Originals replaced while enabled, as (owner, attribute, original) triples
+patched = []
+
+# Add one latency sample to an event histogram
+def recordEvent(name, seconds):
+    stats = eventStats.get(name)
+    if stats is None:
+        stats = eventStats[name] = [0, 0.0, [0] * BUCKETS]
+    stats[0] += 1
+    stats[1] += seconds
+    microseconds = seconds * 1e6
+    bucket = 0 if microseconds < 1 else min(BUCKETS - 1, int(math.log2(microseconds)) + 1)
+    stats[2][bucket] += 1
+
+# Proxy for pymol.cmd that times every function call
+class InstrumentedCmd:
+    def __init__(self, cmd):
+        object.__setattr__(self, "_cmd", cmd)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._cmd, name)
+        if not callable(attribute):
+            return attribute
+        stats = callStats.setdefault(name, [0, 0.0])
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                stats[0] += 1
+                stats[1] += time.perf_counter() - start
+        # Cache the wrapper on the proxy, so later lookups skip __getattr__
+        object.__setattr__(self, name, timed)
+        return timed
+
+# Wrap a method so each call is recorded as an event
+def timedMethod(method, event):
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            recordEvent(event, time.perf_counter() - start)
+    return timed
+
+# The tool's loaded submodule with the given short name, or None
+def loadedModule(name):
+    package = __name__.rpartition(".")[0]
+    return sys.modules.get(package + "." + name if package else name)
+
+def patch(owner, attribute, replacement):
+    patched.append((owner, attribute, getattr(owner, attribute)))
+    setattr(owner, attribute, replacement)
+
+def isPatched(owner, attribute):
+    return any(entry[0] is owner and entry[1] == attribute for entry in patched)
+
+# Patch every loaded module that is not patched yet. Called again when modules are loaded later, such as the dialog
+def refresh():
+    if not enabled:
+        return
+    for name in MODULES:
+        module = loadedModule(name)
+        if module is not None and hasattr(module, "cmd") and not isPatched(module, "cmd"):
+            patch(module, "cmd", InstrumentedCmd(module.cmd))
+    for moduleName, className, methodName, event in TIMED_METHODS:
+        module = loadedModule(moduleName)
+        owner = getattr(module, className, None)
+        if owner is not None and not isPatched(owner, methodName):
+            patch(owner, methodName, timedMethod(getattr(owner, methodName), event))
+
+def enable():
+    global enabled
+    enabled = True
+    # Load the engine, so commands run after this are timed. The dialog is patched when it is opened
+    from . import objects, history
+    refresh()
+
+# Put back every original
+def disable():
+    global enabled
+    enabled = False
+    while patched != []:
+        owner, attribute, original = patched.pop()
+        setattr(owner, attribute, original)
+
+def reset():
+    # The cmd wrappers cached on the proxy hold their lists, so the lists are zeroed in place
+    for stats in callStats.values():
+        stats[0] = 0
+        stats[1] = 0.0
+    eventStats.clear()
+
+# Approximate percentile from a histogram, as the upper bound of the bucket it falls in, in microseconds
+def histogramPercentile(buckets, fraction):
+    total = sum(buckets)
+    if total == 0:
+        return 0.0
+    seen = 0
+    for bucket, count in enumerate(buckets):
+        seen += count
+        if seen >= fraction * total:
+            return float(2 ** bucket)
+    return float(2 ** (len(buckets) - 1))
+
+# The collected statistics as a dictionary
+def report():
+    return {
+        "enabled": enabled,
+        "calls": {name: {"count": count, "seconds": seconds} for name, (count, seconds) in callStats.items() if count},
+        "events": {
+            name: {
+                "count": count,
+                "seconds": seconds,
+                "p50_us": histogramPercentile(buckets, 0.5),
+                "p90_us": histogramPercentile(buckets, 0.9),
+                "p99_us": histogramPercentile(buckets, 0.99),
+                # Upper bound of each bucket in microseconds -> number of samples
+                "histogram_us": {str(2 ** bucket): bucketCount for bucket, bucketCount in enumerate(buckets) if bucketCount},
+            }
+            for name, (count, seconds, buckets) in eventStats.items()
+        },
+    }
+
+# Print the statistics as tables, slowest first
+def printReport():
+    data = report()
+    print(" %-28s %8s %12s %10s" % ("cmd call", "count", "total ms", "mean us"))
+    for name, stats in sorted(data["calls"].items(), key=lambda item: -item[1]["seconds"]):
+        print(" %-28s %8d %12.3f %10.1f" % (name, stats["count"], stats["seconds"] * 1e3, stats["seconds"] * 1e6 / stats["count"]))
+    print(" %-28s %8s %12s %10s %10s %10s" % ("event", "count", "total ms", "p50 us", "p90 us", "p99 us"))
+    for name, stats in sorted(data["events"].items(), key=lambda item: -item[1]["seconds"]):
+        print(" %-28s %8d %12.3f %10.0f %10.0f %10.0f" % (name, stats["count"], stats["seconds"] * 1e3, stats["p50_us"], stats["p90_us"], stats["p99_us"]))
+
+def export(filename):
+    with open(filename, "w") as file:
+        json.dump(report(), file, indent=1)
@@ -0,0 +1,858 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+
+# Transform engine of the Transform Tool. This module does not use Qt, so it can be used headless
+
+import threading
+
+# Import numpy
+import numpy as np
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+# Import the matrix helpers and the undo/redo history
+from . import transform
+from .history import TransformHistory, ROTATE, TRANSLATE
+
+# Objects with at least this many atoms are shown as a lightweight proxy while a slider is dragged,
+# so surfaces and cartoons are not redrawn on every frame. Each level is (minimum atoms, proxy atoms, representation),
+# and the first level the object reaches is used
+FAST_DRAG_LEVELS = [
+    (200000, "name CA+P", "ribbon"),
+    (50000, "all", "lines"),
+]
+
+# Transform state of every object, held in shared arrays so operations across all objects are single numpy passes.
+# Each PymolObject owns one row, which is given back when the object is garbage collected
+class TransformStore:
+    def __init__(self, capacity=64):
+        # Accumulated and committed 4x4 transforms, and the [rx, ry, rz, tx, ty, tz] slider totals
+        self.matrices = np.tile(transform.identity(), (capacity, 1, 1))
+        self.committedMatrices = np.tile(transform.identity(), (capacity, 1, 1))
+        self.totals = np.zeros((capacity, 6))
+        # Unused rows, lowest last
+        self.free = list(range(capacity - 1, -1, -1))
+
+    # Return an unused row set to the identity transform
+    def allocate(self):
+        if self.free == []:
+            self.grow()
+        row = self.free.pop()
+        self.matrices[row] = transform.identity()
+        self.committedMatrices[row] = transform.identity()
+        self.totals[row] = 0.0
+        return row
+
+    def release(self, row):
+        self.free.append(row)
+
+    # Double the number of rows
+    def grow(self):
+        capacity = len(self.matrices)
+        self.matrices = np.concatenate([self.matrices, np.tile(transform.identity(), (capacity, 1, 1))])
+        self.committedMatrices = np.concatenate([self.committedMatrices, np.tile(transform.identity(), (capacity, 1, 1))])
+        self.totals = np.concatenate([self.totals, np.zeros((capacity, 6))])
+        self.free = list(range(2 * capacity - 1, capacity - 1, -1)) + self.free
+
+# The store shared by all objects
+store = TransformStore()
+
+class PymolObject:
+    # Objects are kept small, since tens of thousands of them may be loaded. Groups and selections add their own attributes
+    __slots__ = ("name", "row", "center", "lastFingerprint", "snapshot", "allStates", "transformHistory",
+                 "proxy", "proxyLevel", "proxyMatrix", "fastDragging", "keyframes")
+
+    def __init__(self, name):
+        self.name = name
+        # Row of the store holding the accumulated 4x4 transform of the object, the part of it already written to
+        # the coordinates, and the total rotation and translation. The difference between the two transforms is
+        # shown through the object matrix, so each step costs the same regardless of atom count
+        self.row = store.allocate()
+        # Cached center of mass in its current (displayed) position, and a summary of the coordinates it was computed from
+        self.center = None
+        self.lastFingerprint = None
+        # Coordinates of the object before any transform, used to reset it in one call
+        self.snapshot = None
+        # Whether transforms are written to every state (trajectories, NMR ensembles) or only the current one
+        self.allStates = False
+        # Bounded undo/redo history, created on first use
+        self.transformHistory = None
+        # Hidden copy shown instead of the object during fast drags, the level it was built for,
+        # and the committed transform its coordinates are at
+        self.proxy = None
+        self.proxyLevel = None
+        self.proxyMatrix = None
+        self.fastDragging = False
+        # Transforms captured as animation keyframes
+        self.keyframes = []
+    
+    def __del__(self):
+        # The store is gone when the interpreter shuts down
+        if store is not None:
+            store.release(self.row)
+
+    @property
+    def matrix(self):
+        return store.matrices[self.row]
+
+    @matrix.setter
+    def matrix(self, matrix):
+        store.matrices[self.row] = matrix
+
+    @property
+    def committedMatrix(self):
+        return store.committedMatrices[self.row]
+
+    @committedMatrix.setter
+    def committedMatrix(self, matrix):
+        store.committedMatrices[self.row] = matrix
+
+    # The totals are views into the store, so the sliders' values can be changed in place
+    @property
+    def TotalRotation(self):
+        return store.totals[self.row, 0:3]
+
+    @TotalRotation.setter
+    def TotalRotation(self, rotation):
+        store.totals[self.row, 0:3] = rotation
+
+    @property
+    def TotalTranslation(self):
+        return store.totals[self.row, 3:6]
+
+    @TotalTranslation.setter
+    def TotalTranslation(self, translation):
+        store.totals[self.row, 3:6] = translation
+
+    # The undo/redo history, starting from the current transform
+    @property
+    def history(self):
+        if self.transformHistory is None:
+            self.transformHistory = TransformHistory()
+            self.transformHistory.clear(self.matrix, self.totals())
+        return self.transformHistory
+
+    # Record a step made by a bulk operation, before it is applied. totals are the totals after the step
+    def recordStep(self, step, totals):
+        self.history.pushMatrix(step, self.matrix, self.totals(), np.subtract(totals, self.totals()))
+
+    # Number of atoms, from the last fingerprint if there is one
+    def atomCount(self):
+        if self.lastFingerprint is not None:
+            return self.lastFingerprint[0]
+        return cmd.count_atoms(self.name)
+
+    # Rotate action
+    def rotate(self, axis, angle):
+        center = self.getCenter()
+        # Add the action to the history, merged with the current step if it is a rotation about the same axis
+        self.history.push(ROTATE, transform.AXES[axis], [angle, 0.0, 0.0], center, self.matrix, self.totals())
+        # Rotate the object about its current center. A rotation about the center leaves the center unchanged
+        self.matrix = transform.aboutPoint(transform.rotationMatrix(axis, angle), center) @ self.matrix
+        self.apply()
+        # Update the total rotation vector
+        if axis == "x":
+            self.TotalRotation[0] += angle
+        elif axis == "y":
+            self.TotalRotation[1] += angle
+        elif axis == "z":
+            self.TotalRotation[2] += angle
+
+    
+    # Translate action
+    def translate(self, vector):
+        # Add the action to the history, merged with the current step if it is also a translation
+        self.history.push(TRANSLATE, 0, vector, [0.0, 0.0, 0.0], self.matrix, self.totals())
+        # Translate the object
+        self.matrix = transform.translationMatrix(vector) @ self.matrix
+        self.apply()
+        # Move the cached center by the same vector
+        if self.center is not None:
+            self.center = self.center + vector
+        # Update the total translation vector
+        self.TotalTranslation += vector
+
+    # Rotate and translate by whatever brings the totals to the given values, such as slider positions
+    def moveTo(self, rotation, translation):
+        for axis, value, total in zip("xyz", rotation, self.TotalRotation):
+            if value != total:
+                self.rotate(axis, value - total)
+        delta = [value - total for value, total in zip(translation, self.TotalTranslation)]
+        if delta != [0.0, 0.0, 0.0]:
+            self.translate(delta)
+
+    # Rotate about the center (in degrees, about the x, y and z axes in that order) and then translate, as one undo step
+    def move(self, rotation, translation):
+        center = self.getCenter()
+        rotationMatrix = transform.identity()
+        for axis, angle in zip("xyz", rotation):
+            rotationMatrix = transform.rotationMatrix(axis, angle) @ rotationMatrix
+        step = transform.translationMatrix(translation) @ transform.aboutPoint(rotationMatrix, center)
+        self.history.pushMatrix(step, self.matrix, self.totals(), list(rotation) + list(translation))
+        self.setMatrix(step @ self.matrix)
+        self.TotalRotation += rotation
+        self.TotalTranslation += translation
+
+    # End the current step, so the next action gets its own undo entry
+    def closeStep(self):
+        self.history.closeStep()
+
+    # The total rotation and translation as one [rx, ry, rz, tx, ty, tz] list
+    def totals(self):
+        return store.totals[self.row].tolist()
+
+    # Jump to a new accumulated transform and show it in one call
+    def setState(self, matrix, totals):
+        self.TotalRotation = [float(value) for value in totals[0:3]]
+        self.TotalTranslation = [float(value) for value in totals[3:6]]
+        self.setMatrix(matrix)
+
+    # Replace the accumulated transform and show it
+    def setMatrix(self, matrix):
+        # Move the cached center with the object
+        if self.center is not None:
+            self.center = transform.transformPoint(matrix @ transform.invert(self.matrix), self.center)
+        self.matrix = matrix
+        self.apply()
+
+    # Return the center of mass, computing it only if it is not cached
+    def getCenter(self):
+        if self.center is None:
+            self.center = transform.transformPoint(self.pendingMatrix(), cmd.centerofmass(self.name))
+        return self.center
+
+    # Cheap summary of the object's atoms and coordinates, used to notice changes made outside the tool
+    def fingerprint(self):
+        return (cmd.count_atoms(self.name), cmd.count_states(self.name), cmd.get_extent(self.name))
+
+    # The state argument for cmd calls: 0 for all states, -1 for the current state
+    def stateArgument(self):
+        return 0 if self.allStates else -1
+
+    # Switch between transforming all states and only the current state
+    def setAllStates(self, allStates):
+        if allStates == self.allStates:
+            return
+        # The snapshot has to cover the states that will be written from now on
+        self.commit()
+        # Only the current state was written so far, so the other states are brought to the committed transform:
+        # the current state is moved back to the original coordinates and then every state is moved forward
+        if allStates and cmd.count_states(self.name) > 1 and not np.allclose(self.committedMatrix, transform.identity()):
+            cmd.transform_object(self.name, transform.toTTT(transform.invert(self.committedMatrix)), state=-1, homogenous=1)
+            cmd.transform_object(self.name, transform.toTTT(self.committedMatrix), state=0, homogenous=1)
+            self.lastFingerprint = self.fingerprint()
+        self.allStates = allStates
+        self.takeSnapshot()
+
+    # Throw away the cached center and snapshot if the atoms or coordinates were changed outside the tool, and take
+    # the snapshot if asked. Headless commands do not ask, so only objects selected in the dialog keep a copy of their
+    # coordinates. Only called when nothing is pending, so the coordinates match what PyMOL reports
+    def checkForChanges(self, snapshot=True):
+        fingerprint = self.fingerprint()
+        if fingerprint != self.lastFingerprint:
+            self.center = None
+            self.lastFingerprint = fingerprint
+            self.snapshot = None
+            # The proxy was copied from the old atoms
+            self.dropProxy()
+        if snapshot and self.snapshot is None:
+            self.takeSnapshot()
+
+    # Store the coordinates of the current state as they would be without any of the tool's transforms.
+    # With all states there is no snapshot, since PyMOL writes a single state per call: reset then writes the inverse
+    # of the committed transform to every state with one transform_object call
+    def takeSnapshot(self):
+        coords = None if self.allStates else cmd.get_coords(self.name, state=-1)
+        if coords is None:
+            self.snapshot = None
+            return
+        # Map the committed coordinates back through the inverse of the committed transform
+        inverse = transform.invert(self.committedMatrix)
+        coords = coords @ inverse[0:3, 0:3].T + inverse[0:3, 3]
+        self.snapshot = np.ascontiguousarray(coords, dtype=np.float32)
+
+    # Free the snapshot memory. It is taken again the next time the object is selected
+    def releaseSnapshot(self):
+        self.snapshot = None
+        self.lastFingerprint = None
+        self.dropProxy()
+
+    # The fast drag level for the object's size, or None if it is small enough to drag as it is
+    def fastDragLevel(self):
+        atoms = self.lastFingerprint[0] if self.lastFingerprint is not None else cmd.count_atoms(self.name)
+        for level in FAST_DRAG_LEVELS:
+            if atoms >= level[0]:
+                return level
+        return None
+
+    # Show the proxy instead of the object until endFastDrag. The object's representations are only hidden,
+    # so they are shown again without being rebuilt
+    def startFastDrag(self):
+        level = self.fastDragLevel()
+        if level is None or self.fastDragging:
+            return
+        if self.proxy is None or self.proxyLevel != level:
+            self.buildProxy(level)
+        # Bring the proxy's coordinates up to the committed transform. The proxy is small, so this is cheap
+        step = self.committedMatrix @ transform.invert(self.proxyMatrix)
+        if not np.allclose(step, transform.identity()):
+            cmd.transform_object(self.proxy, transform.toTTT(step), state=1, homogenous=1)
+            self.proxyMatrix = self.committedMatrix.copy()
+        self.fastDragging = True
+        self.apply()
+        cmd.enable(self.proxy)
+        cmd.disable(self.name)
+
+    # Show the object again in place of the proxy
+    def endFastDrag(self):
+        if not self.fastDragging:
+            return
+        self.fastDragging = False
+        cmd.enable(self.name)
+        cmd.disable(self.proxy)
+
+    # Copy the proxy atoms of the current state into a hidden object shown with the level's representation
+    def buildProxy(self, level):
+        self.dropProxy()
+        self.proxy = cmd.get_unused_name("_tt_proxy")
+        cmd.create(self.proxy, "(%s) and (%s)" % (self.name, level[1]), source_state=cmd.get_state(), target_state=1, zoom=0)
+        cmd.show_as(level[2], self.proxy)
+        cmd.disable(self.proxy)
+        self.proxyLevel = level
+        self.proxyMatrix = self.committedMatrix.copy()
+
+    def dropProxy(self):
+        if self.proxy is None:
+            return
+        if self.fastDragging:
+            self.endFastDrag()
+        cmd.delete(self.proxy)
+        self.proxy = None
+        self.proxyLevel = None
+        self.proxyMatrix = None
+
+    # The part of the accumulated transform that has not been written to the coordinates yet
+    def pendingMatrix(self):
+        return self.matrix @ transform.invert(self.committedMatrix)
+
+    # Show the pending transform through the object matrix. This is a single O(1) call
+    def apply(self):
+        ttt = transform.toTTT(self.pendingMatrix())
+        cmd.set_object_ttt(self.name, ttt)
+        # The proxy's coordinates are at the committed transform too, so it is moved by the same matrix
+        if self.fastDragging:
+            cmd.set_object_ttt(self.proxy, ttt)
+
+    # Write the pending transform to the coordinates in one call and clear the object matrix
+    def commit(self):
+        pending = self.pendingMatrix()
+        # Nothing to do if the coordinates are already up to date
+        if np.allclose(pending, transform.identity()):
+            return
+        cmd.set_object_ttt(self.name, transform.toTTT(transform.identity()))
+        self.writeMatrix(pending)
+        self.committedMatrix = self.matrix.copy()
+        # The coordinates were changed by the tool itself, so the cached center is still valid
+        self.lastFingerprint = self.fingerprint()
+
+    # Transform the coordinates by matrix. With all states, PyMOL transforms every state in a single call
+    def writeMatrix(self, matrix):
+        cmd.transform_object(self.name, transform.toTTT(matrix), state=self.stateArgument(), homogenous=1)
+
+    # Write the snapshot back to the coordinates
+    def restoreSnapshot(self):
+        cmd.load_coords(self.snapshot, self.name, state=-1)
+
+
+    # Undo action
+    def undo(self, steps=1):
+        # Check if there is anything to undo
+        if not self.history.canUndo():
+            return
+        # Jump straight to the state before the last steps
+        matrix, totals = self.history.goto(self.history.position - steps)
+        self.setState(matrix, totals)
+    
+    # Redo action
+    def redo(self, steps=1):
+        # Check if there is anything to redo
+        if not self.history.canRedo():
+            return
+        # Jump straight to the state after the next steps
+        matrix, totals = self.history.goto(self.history.position + steps)
+        self.setState(matrix, totals)
+    
+    # Reset action
+    def reset(self):
+        # Without a snapshot, jump back to the identity transform through the object matrix
+        if self.snapshot is None:
+            self.setState(transform.identity(), [0.0] * 6)
+        # Otherwise restore the snapshot in one call
+        else:
+            cmd.set_object_ttt(self.name, transform.toTTT(transform.identity()))
+            self.restoreSnapshot()
+            self.forgetTransform()
+        # Clear the history
+        self.history.clear()
+
+    # Forget the accumulated transform once the original coordinates have been restored
+    def forgetTransform(self):
+        # Move the cached center back with the object
+        if self.center is not None:
+            self.center = transform.transformPoint(transform.invert(self.matrix), self.center)
+        self.matrix = transform.identity()
+        self.committedMatrix = transform.identity()
+        self.TotalRotation = [0.0, 0.0, 0.0]
+        self.TotalTranslation = [0.0, 0.0, 0.0]
+        self.lastFingerprint = self.fingerprint()
+
+# Return members in PyMOL's object order, which is the order their atoms appear in a selection
+def inObjectOrder(members):
+    order = {name: index for index, name in enumerate(cmd.get_names())}
+    return sorted(members, key=lambda member: order[member.name])
+
+# Return the name of the group of members, a selection expression covering all of them
+def groupName(members):
+    return "(" + " or ".join(member.name for member in inObjectOrder(members)) + ")"
+
+# Several objects moved together about their shared center of mass.
+# The group's name is a selection expression covering all members, so the inherited
+# center of mass and fingerprint work on the whole group at once
+class PymolObjectGroup(PymolObject):
+    def __init__(self, members):
+        self.members = inObjectOrder(members)
+        PymolObject.__init__(self, groupName(self.members))
+        # Start from the members' current coordinates
+        for member in self.members:
+            member.commit()
+            member.closeStep()
+
+    # Check every member, then the group as a whole
+    def checkForChanges(self, snapshot=True):
+        for member in self.members:
+            member.checkForChanges(snapshot)
+        PymolObject.checkForChanges(self, snapshot)
+
+    # Each member keeps its own snapshot
+    def takeSnapshot(self):
+        self.snapshot = None
+
+    # Each member decides on its own proxy
+    def startFastDrag(self):
+        for member in self.members:
+            member.startFastDrag()
+
+    def endFastDrag(self):
+        for member in self.members:
+            member.endFastDrag()
+
+    # Switch all members between transforming all states and only the current state
+    def setAllStates(self, allStates):
+        self.commit()
+        self.allStates = allStates
+        for member in self.members:
+            member.setAllStates(allStates)
+
+    # Show the pending group transform through each member's object matrix
+    def apply(self):
+        pending = self.pendingMatrix()
+        for member in self.members:
+            member.setMatrix(pending @ member.committedMatrix)
+
+    # Write the pending group transform to all members with one read, one matrix multiply and one write
+    def commit(self):
+        pending = self.pendingMatrix()
+        # Nothing to do if the coordinates are already up to date
+        if np.allclose(pending, transform.identity()):
+            return
+        for member in self.members:
+            cmd.set_object_ttt(member.name, transform.toTTT(transform.identity()))
+        # Members transforming all their states are written one call per member
+        if any(member.allStates for member in self.members):
+            for member in self.members:
+                member.writeMatrix(pending)
+        else:
+            coords = cmd.get_coords(self.name, state=-1)
+            coords = coords @ pending[0:3, 0:3].T + pending[0:3, 3]
+            cmd.load_coords(coords, self.name, state=-1)
+        self.committedMatrix = self.matrix.copy()
+        for member in self.members:
+            # Record the move in the member's own history, so it can still be undone when the member is selected alone
+            member.history.pushMatrix(pending, member.committedMatrix, member.totals())
+            member.committedMatrix = member.matrix.copy()
+            member.lastFingerprint = member.fingerprint()
+        self.lastFingerprint = self.fingerprint()
+
+    # Reset every member to its original coordinates
+    def reset(self):
+        # Restore all snapshots in one call if every member has a single state snapshot
+        if all(member.snapshot is not None and not member.allStates for member in self.members):
+            for member in self.members:
+                cmd.set_object_ttt(member.name, transform.toTTT(transform.identity()))
+            cmd.load_coords(np.concatenate([member.snapshot for member in self.members]), self.name, state=-1)
+            for member in self.members:
+                member.forgetTransform()
+                member.history.clear()
+        else:
+            for member in self.members:
+                member.reset()
+                member.commit()
+        # The members were not moved as a rigid body, so the shared center has to be recomputed
+        self.center = None
+        self.forgetTransform()
+        self.history.clear()
+
+# Part of one or more objects, given by a selection expression such as "chain B and resi 100-250".
+# The selection is resolved once into atom indices, which are only resolved again when the atoms of the objects
+# change. Each step transforms the selected rows of a cached copy of the coordinates and writes it back by object name,
+# so the selection is never evaluated during a drag
+class PymolSelection(PymolObject):
+    def __init__(self, expression):
+        PymolObject.__init__(self, expression)
+        # Per object: indices of the selected atoms, the selected coordinates at the committed transform,
+        # and the coordinates of the whole object as currently displayed
+        self.indices = {}
+        self.committedCoords = {}
+        self.displayCoords = {}
+        # Atom counts the indices were resolved for
+        self.topology = None
+        self.resolve()
+
+    # Atom counts of the selection and of every object it was resolved in
+    def topologyKey(self):
+        return (cmd.count_atoms(self.name), tuple(cmd.count_atoms(name) for name in self.indices))
+
+    # Resolve the selection into atom indices of each object, and read the coordinates
+    def resolve(self):
+        indices = {}
+        for model, index in cmd.index(self.name):
+            indices.setdefault(model, []).append(index - 1)
+        self.indices = {model: np.array(values) for model, values in indices.items()}
+        self.topology = self.topologyKey()
+        self.readCoords()
+
+    # Cache the coordinates of the current state
+    def readCoords(self):
+        for name, indices in self.indices.items():
+            self.displayCoords[name] = cmd.get_coords(name, state=-1)
+            self.committedCoords[name] = self.displayCoords[name][indices]
+        self.center = None
+        self.lastFingerprint = self.fingerprint()
+
+    def fingerprint(self):
+        return tuple(cmd.get_extent(name) for name in self.indices)
+
+    # Resolve the selection again if atoms were added or removed, or read the coordinates again if they were moved outside the tool
+    def checkForChanges(self, snapshot=True):
+        if self.topologyKey() != self.topology:
+            self.resolve()
+        elif self.fingerprint() != self.lastFingerprint:
+            self.readCoords()
+
+    # The displayed coordinates already include the pending transform
+    def getCenter(self):
+        if self.center is None:
+            self.center = np.array(cmd.centerofmass(self.name))
+        return self.center
+
+    # Reset goes back through the history matrices, since only the selected atoms are moved
+    def takeSnapshot(self):
+        self.snapshot = None
+
+    # Only the current state is cached
+    def setAllStates(self, allStates):
+        pass
+
+    # The proxy replaces whole objects, so selections are always dragged as they are
+    def startFastDrag(self):
+        pass
+
+    def endFastDrag(self):
+        pass
+
+    # Transform the selected rows and write each object's coordinates in one call
+    def apply(self):
+        pending = self.pendingMatrix()
+        for name, indices in self.indices.items():
+            coords = self.displayCoords[name]
+            coords[indices] = self.committedCoords[name] @ pending[0:3, 0:3].T + pending[0:3, 3]
+            cmd.load_coords(coords, name, state=-1)
+
+    # The coordinates are already written, so committing only moves the cache forward
+    def commit(self):
+        if np.allclose(self.pendingMatrix(), transform.identity()):
+            return
+        for name, indices in self.indices.items():
+            self.committedCoords[name] = self.displayCoords[name][indices]
+        self.committedMatrix = self.matrix.copy()
+        self.lastFingerprint = self.fingerprint()
+
+class PymolObjectList:
+    def __init__(self):
+        # Create a new list. Each object in the list should contain an undo stack
+        self.list = []
+        # The same objects indexed by name
+        self.byName = {}
+        # Groups of objects that move together
+        self.groups = []
+        # Parts of objects given by selection expressions
+        self.selections = []
+        # Functions called with (added, removed, renamed) whenever the entries change
+        self.listeners = []
+        self.currentSelection = None
+        # Call update to populate the list
+        self.update()
+        # Set the current selection to the first object in the list, if there is one
+        self.currentSelection = self.list[0] if self.list != [] else None
+
+    def addListener(self, listener):
+        self.listeners.append(listener)
+
+    # Tell the listeners which entries were added, removed and renamed (as (entry, old name) pairs)
+    def notify(self, added, removed, renamed):
+        if added == [] and removed == [] and renamed == []:
+            return
+        for listener in list(self.listeners):
+            listener(added, removed, renamed)
+
+    # Bring the list up to date with the objects in the session, applying only the differences
+    def update(self):
+        # Get the list of objects in the current session, ignoring any objects named "Axes" and hidden objects such as the fast drag proxies
+        names = [name for name in cmd.get_names() if name != "Axes" and not name.startswith("_")]
+        present = set(names)
+        removed = [object for object in self.list if object.name not in present]
+        addedNames = [name for name in names if name not in self.byName]
+        renamed = []
+        # A single object that disappeared while a single new one appeared with the same atoms and coordinates was renamed
+        if len(removed) == 1 and len(addedNames) == 1 and removed[0].lastFingerprint is not None:
+            object = removed[0]
+            oldName = object.name
+            object.name = addedNames[0]
+            if object.fingerprint() == object.lastFingerprint:
+                del self.byName[oldName]
+                self.byName[object.name] = object
+                renamed.append((object, oldName))
+                removed = []
+                addedNames = []
+            else:
+                object.name = oldName
+        # Forget removed objects
+        for object in removed:
+            del self.byName[object.name]
+            object.releaseSnapshot()
+        if removed != [] or renamed != []:
+            self.list = [object for object in self.list if object.name in self.byName]
+            # Groups refer to their members by name, so groups with a removed or renamed member are dropped
+            changed = set(id(object) for object in removed) | set(id(object) for object, oldName in renamed)
+            droppedGroups = [group for group in self.groups if any(id(member) in changed for member in group.members)]
+            self.groups = [group for group in self.groups if group not in droppedGroups]
+            # Selections are resolved to atom indices of objects by name, so they are dropped the same way
+            droppedSelections = [selection for selection in self.selections if any(name not in self.byName for name in selection.indices)]
+            self.selections = [selection for selection in self.selections if selection not in droppedSelections]
+            removed = removed + droppedGroups + droppedSelections
+        # Add new objects
+        added = []
+        for name in addedNames:
+            object = PymolObject(name)
+            self.byName[name] = object
+            self.list.append(object)
+            added.append(object)
+        if self.currentSelection in removed:
+            self.currentSelection = self.list[0] if self.list != [] else None
+        self.notify(added, removed, renamed)
+    
+    # Return the object with the given name, or None
+    def get(self, name):
+        return self.byName.get(name)
+
+    # All objects followed by all groups and selections, in the order they are shown in the selection list
+    def entries(self):
+        return self.list + self.groups + self.selections
+
+    # Return the entry shown at index in the selection list
+    def entryAt(self, index):
+        return self.entries()[index]
+
+    # Return the entry for a selection expression, creating it if needed, or None if it matches no atoms
+    def getSelection(self, expression):
+        for selection in self.selections:
+            if selection.name == expression:
+                selection.checkForChanges()
+                return selection
+        if cmd.count_atoms(expression) == 0:
+            return None
+        selection = PymolSelection(expression)
+        self.selections.append(selection)
+        self.notify([selection], [], [])
+        return selection
+
+    # Group the named objects so a single gesture moves all of them, and select the group
+    def setMultiSelection(self, names):
+        members = [self.byName[name] for name in dict.fromkeys(names) if name in self.byName]
+        if members == []:
+            return None
+        # Reuse an existing group with the same members, which keeps its transform and history
+        name = groupName(members)
+        group = next((existing for existing in self.groups if existing.name == name), None)
+        if group is None:
+            group = PymolObjectGroup(members)
+            self.groups.append(group)
+            self.notify([group], [], [])
+        self.changeSelection(group)
+        return group
+
+    # Change the current selection
+    def changeSelection(self, newSelection):
+        # Set the current selection to the new selection
+        self.currentSelection = newSelection
+
+    # Write the pending transforms of many objects with one read and one write of the coordinates
+    def commitMany(self, objects):
+        # Only objects with a pending transform need writing
+        if objects == []:
+            return
+        rows = np.array([object.row for object in objects])
+        pending = store.matrices[rows] @ transform.invertMany(store.committedMatrices[rows])
+        moved = np.abs(pending - transform.identity()).max(axis=(1, 2)) > 1e-8
+        objects = [object for object, isMoved in zip(objects, moved) if isMoved]
+        # Objects transforming all their states, and selections, are written with one call each
+        for object in objects:
+            if object.allStates or isinstance(object, PymolSelection):
+                object.commit()
+        objects = [object for object in objects if not object.allStates and not isinstance(object, PymolSelection)]
+        if len(objects) < 2:
+            for object in objects:
+                object.commit()
+            return
+        # Keep the objects in PyMOL's object order, which is the order their atoms appear in a selection
+        order = {name: index for index, name in enumerate(cmd.get_names())}
+        objects.sort(key=lambda object: order[object.name])
+        # Clear the object matrices first, as the group commit does, so the coordinates read are the committed ones
+        for object in objects:
+            cmd.set_object_ttt(object.name, transform.toTTT(transform.identity()))
+        selection = "(" + " or ".join(object.name for object in objects) + ")"
+        coords = cmd.get_coords(selection, state=-1)
+        # Transform every object's block of coordinates in one pass, each atom by its object's pending matrix
+        counts = np.array([object.atomCount() for object in objects])
+        if counts.sum() != len(coords):
+            counts = np.array([cmd.count_atoms(object.name) for object in objects])
+        rows = np.array([object.row for object in objects])
+        pending = store.matrices[rows] @ transform.invertMany(store.committedMatrices[rows])
+        owner = np.repeat(np.arange(len(objects)), counts)
+        coords = np.einsum("aij,aj->ai", pending[owner, 0:3, 0:3], coords) + pending[owner, 0:3, 3]
+        cmd.load_coords(coords, selection, state=-1)
+        store.committedMatrices[rows] = store.matrices[rows]
+        # The new extent of single state objects is taken from the coordinates just written, saving three calls per object
+        coords = coords.astype(np.float32)
+        starts = np.cumsum(counts) - counts
+        lows = np.minimum.reduceat(coords, starts)
+        highs = np.maximum.reduceat(coords, starts)
+        for object, count, low, high in zip(objects, counts, lows.tolist(), highs.tolist()):
+            if object.lastFingerprint is not None and object.lastFingerprint[1] == 1 and count > 0:
+                object.lastFingerprint = (object.lastFingerprint[0], 1, [low, high])
+            else:
+                object.lastFingerprint = object.fingerprint()
+
+    # Reset many objects, restoring all their snapshots with one write of the coordinates
+    def resetMany(self, objects):
+        # Objects without a single state snapshot are reset one by one
+        withSnapshot = [object for object in objects if object.snapshot is not None and not object.allStates]
+        for object in objects:
+            if object.snapshot is None or object.allStates:
+                object.reset()
+                object.commit()
+        if withSnapshot == []:
+            return
+        # Keep the objects in PyMOL's object order, which is the order their atoms appear in a selection
+        order = {name: index for index, name in enumerate(cmd.get_names())}
+        withSnapshot.sort(key=lambda object: order[object.name])
+        for object in withSnapshot:
+            cmd.set_object_ttt(object.name, transform.toTTT(transform.identity()))
+        selection = "(" + " or ".join(object.name for object in withSnapshot) + ")"
+        cmd.load_coords(np.concatenate([object.snapshot for object in withSnapshot]), selection, state=-1)
+        for object in withSnapshot:
+            object.forgetTransform()
+            object.history.clear()
+
+    # Rows of the store used by the objects
+    def rows(self):
+        return np.array([object.row for object in self.list], dtype=np.intp)
+
+    # Move every object by step as one undo step, updating all transforms in one pass and writing the coordinates at once.
+    # translation is added to the translation totals
+    def transformAll(self, step, translation=(0.0, 0.0, 0.0)):
+        rows = self.rows()
+        totals = store.totals[rows].copy()
+        totals[:, 3:6] += translation
+        for object, objectTotals in zip(self.list, totals):
+            object.recordStep(step, objectTotals)
+            # Move the cached center with the object
+            if object.center is not None:
+                object.center = transform.transformPoint(step, object.center)
+        store.matrices[rows] = step @ store.matrices[rows]
+        store.totals[rows] = totals
+        self.commitMany(self.list)
+
+    # Move each object by its own step (an (n, 4, 4) array) as one undo step each, adding deltas (an (n, 6) array) to
+    # its totals, and write the coordinates at once
+    def transformEach(self, objects, steps, deltas):
+        rows = np.array([object.row for object in objects], dtype=np.intp)
+        for object, step, delta in zip(objects, steps, deltas):
+            object.history.pushMatrix(step, object.matrix, object.totals(), delta)
+            # Move the cached center with the object
+            if object.center is not None:
+                object.center = transform.transformPoint(step, object.center)
+        store.matrices[rows] = steps @ store.matrices[rows]
+        store.totals[rows] += deltas
+        self.commitMany(objects)
+
+    # Move every entry back to where it was before the tool moved it and clear all histories. Selections are reset
+    # first, since their atoms belong to the objects. Objects with a snapshot are restored from it with one write,
+    # and the others through the inverse of their transform with one more
+    def resetAll(self):
+        for selection in self.selections:
+            selection.reset()
+            selection.commit()
+        self.resetMany([object for object in self.list if object.snapshot is not None and not object.allStates])
+        objects = [object for object in self.list if object.snapshot is None or object.allStates]
+        rows = np.array([object.row for object in objects], dtype=np.intp)
+        for object in objects:
+            if object.center is not None:
+                object.center = transform.transformPoint(transform.invert(object.matrix), object.center)
+            if object.transformHistory is not None:
+                object.transformHistory.clear()
+        store.matrices[rows] = transform.identity()
+        store.totals[rows] = 0.0
+        self.commitMany(objects)
+        # The members of each group were reset, so the group's own transform is forgotten
+        for group in self.groups:
+            group.center = None
+            group.forgetTransform()
+            group.history.clear()
+
+    # Return the names, accumulated transforms and totals of every object as arrays
+    def exportAll(self):
+        rows = self.rows()
+        return [object.name for object in self.list], store.matrices[rows].copy(), store.totals[rows].copy()
+
+# The object list shared by the dialog and the scripting commands
+objectList = None
+
+# Held by the scripting commands, and by the streaming server when it changes the objects from its own thread
+lock = threading.RLock()
+
+# Return the shared object list, creating or updating it as needed
+def getObjectList():
+    global objectList
+    if objectList is None:
+        objectList = PymolObjectList()
+    else:
+        objectList.update()
+    return objectList
@@ -0,0 +1,128 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Binary protocol of the Transform Tool's streaming server, and a client for external programs.
+# This module does not use PyMOL, so docking and analysis tools can import it on its own.
+#
+# Every message is a batch of updates: a header of two little-endian uint32 (number of updates, payload bytes),
+# then for each update a uint16 name length, the UTF-8 object name, and the object's accumulated 4x4 transform
+# as 16 little-endian doubles in row-major order. The transform replaces the object's transform in the tool,
+# so only the newest one per object matters.
+#
+# Stand-in client, spinning objects at a fixed rate:
+#
+#   python -m pymolTransformTool.protocol 127.0.0.1:7777 obj1 obj2 --rate 1000 --seconds 10
+
+import argparse
+import math
+import socket
+import struct
+import sys
+import time
+
+HEADER = struct.Struct("<II")
+NAME_LENGTH = struct.Struct("<H")
+MATRIX = struct.Struct("<16d")
+
+# Default address of the server
+DEFAULT_ADDRESS = "127.0.0.1:7777"
+
+# Return ("unix", path) for "unix:/path", or ("tcp", (host, port)) for "host:port" or "port"
+def parseAddress(address):
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, separator, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+# Return the 16 floats of a 4x4 matrix given as a numpy array, nested lists or a flat sequence
+def flatten(matrix):
+    if hasattr(matrix, "ravel"):
+        return matrix.ravel().tolist()
+    if len(matrix) == 4:
+        return [float(value) for row in matrix for value in row]
+    return [float(value) for value in matrix]
+
+# Encode (name, matrix) pairs as one message
+def encodeUpdates(updates):
+    parts = []
+    for name, matrix in updates:
+        encoded = name.encode("utf-8")
+        parts.append(NAME_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+        parts.append(MATRIX.pack(*flatten(matrix)))
+    payload = b"".join(parts)
+    return HEADER.pack(len(parts) // 3, len(payload)) + payload
+
+# Decode the payload of a message into (name, 16 floats) pairs
+def decodeUpdates(payload, count):
+    updates = []
+    offset = 0
+    for _ in range(count):
+        length, = NAME_LENGTH.unpack_from(payload, offset)
+        offset += NAME_LENGTH.size
+        name = payload[offset:offset + length].decode("utf-8")
+        offset += length
+        updates.append((name, MATRIX.unpack_from(payload, offset)))
+        offset += MATRIX.size
+    if offset != len(payload):
+        raise struct.error("payload has %d bytes after %d updates" % (len(payload) - offset, count))
+    return updates
+
+class TransformClient:
+    def __init__(self, address=DEFAULT_ADDRESS):
+        kind, target = parseAddress(address)
+        if kind == "unix":
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.connect(target)
+
+    # Set the transform of one object
+    def send(self, name, matrix):
+        self.socket.sendall(encodeUpdates([(name, matrix)]))
+
+    # Set the transforms of many objects in one message
+    def sendBatch(self, updates):
+        self.socket.sendall(encodeUpdates(updates))
+
+    def close(self):
+        self.socket.close()
+
+# The transform rotating by angle degrees about the z axis
+def spin(angle):
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    return [c, -s, 0.0, 0.0, s, c, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream spinning transforms to the Transform Tool's server.")
+    parser.add_argument("address", help="server address: host:port, port or unix:/path")
+    parser.add_argument("objects", nargs="+", help="objects to move")
+    parser.add_argument("--rate", type=float, default=1000.0, help="batches per second")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long to stream")
+    args = parser.parse_args(argv)
+
+    client = TransformClient(args.address)
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < args.seconds:
+        angle = 360.0 * (time.perf_counter() - start) / 10.0
+        client.sendBatch([(name, spin(angle)) for name in args.objects])
+        sent += 1
+        # Keep to the requested rate
+        delay = start + sent / args.rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    client.close()
+    elapsed = time.perf_counter() - start
+    print("Sent %d batches (%d updates) in %.2f s, %.0f updates/s" % (sent, sent * len(args.objects), elapsed, sent * len(args.objects) / elapsed))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
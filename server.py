@@ -0,0 +1,269 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Local server streaming transforms from external programs into the Transform Tool.
+# An asyncio event loop on its own thread reads messages in the format of protocol.py and keeps only the newest
+# transform per object. Once per frame the newest transforms are shown through the object matrices, and when the
+# stream pauses they are written to the coordinates in one pass and recorded as one undo step per object.
+# The objects are only changed on PyMOL's main thread when Qt runs there, so the dialog and commands never race with
+# the server. Without Qt (headless PyMOL) the event loop thread changes them while holding the engine lock
+
+import asyncio
+import concurrent.futures
+import struct
+import threading
+import traceback
+
+import numpy as np
+
+# Entrypoint into Pymol API
+from pymol import cmd
+
+from . import transform
+from . import objects
+from .protocol import HEADER, DEFAULT_ADDRESS, parseAddress, decodeUpdates
+
+# Seconds between applying the newest transforms, one display frame
+FRAME_INTERVAL = 0.016
+# Seconds without updates after which the streamed transforms are written to the coordinates
+IDLE_COMMIT = 0.5
+# Largest accepted message payload, in bytes
+MAX_PAYLOAD = 64 * 1024 * 1024
+# Seconds stop waits for the event loop thread to close the connections and end
+STOP_TIMEOUT = 5.0
+
+class TransformServer:
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = address
+        self.loop = None
+        self.thread = None
+        self.server = None
+        # Tasks reading from the connected clients, with their writers, so stopping can close them
+        self.clients = {}
+        # Newest transform per object name, waiting for the next frame. Filled by the event loop thread under pendingLock
+        self.pending = {}
+        self.pendingLock = threading.Lock()
+        # Objects shown through their object matrix but not yet written to the coordinates, with their transform
+        # and totals from before the stream. Only used by the thread applying the updates
+        self.uncommitted = {}
+        self.idleTime = 0.0
+        # Counters: updates received, updates applied after coalescing, and updates rejected
+        self.received = 0
+        self.applied = 0
+        self.rejected = 0
+        self.started = threading.Event()
+        self.error = None
+        # Frames are handed to the main thread through its Qt event loop when there is one
+        self.mainThreadCall = None
+        self.ticking = False
+
+    # Start the event loop thread and wait until the server listens. Called on PyMOL's main thread
+    def start(self):
+        try:
+            from PyQt5 import QtWidgets
+        except ImportError:
+            QtWidgets = None
+        if QtWidgets is not None and QtWidgets.QApplication.instance() is not None:
+            from .worker import MainThreadCall
+            self.mainThreadCall = MainThreadCall(self.tick)
+        self.thread = threading.Thread(target=self.run, name="TransformServer", daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.listen())
+        except Exception as error:
+            self.error = error
+            self.started.set()
+            return
+        self.started.set()
+        self.loop.run_until_complete(self.frameLoop())
+        self.loop.close()
+
+    async def listen(self):
+        kind, target = parseAddress(self.address)
+        if kind == "unix":
+            self.server = await asyncio.start_unix_server(self.handleClient, path=target)
+        else:
+            self.server = await asyncio.start_server(self.handleClient, host=target[0], port=target[1])
+            # Report the port the system picked when port 0 was asked for
+            self.address = "%s:%d" % self.server.sockets[0].getsockname()[0:2]
+
+    # Read messages from one client until it disconnects
+    async def handleClient(self, reader, writer):
+        task = asyncio.current_task()
+        self.clients[task] = writer
+        try:
+            while True:
+                count, size = HEADER.unpack(await reader.readexactly(HEADER.size))
+                # The rest of the stream cannot be trusted after an oversized header, so the client is dropped
+                if size > MAX_PAYLOAD:
+                    self.rejected += 1
+                    break
+                payload = await reader.readexactly(size)
+                # A malformed message is skipped, and the next one is read from the following header
+                try:
+                    updates = decodeUpdates(payload, count)
+                except (struct.error, UnicodeDecodeError):
+                    self.rejected += 1
+                    continue
+                self.received += len(updates)
+                # Only the newest transform per object is kept until the next frame
+                with self.pendingLock:
+                    self.pending.update(updates)
+        # Stopping the server cancels the task, which then ends like a disconnect
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            del self.clients[task]
+            writer.close()
+
+    # Once per frame, have the updates applied on the main thread, or apply them here under the engine lock.
+    # The lock is only tried, so a long command on the main thread delays frames instead of blocking the event loop
+    async def frameLoop(self):
+        while self.server is not None:
+            await asyncio.sleep(FRAME_INTERVAL)
+            if self.mainThreadCall is not None:
+                self.mainThreadCall.trigger()
+            elif objects.lock.acquire(blocking=False):
+                try:
+                    self.tick()
+                finally:
+                    objects.lock.release()
+
+    # Apply the newest transforms, and write them to the coordinates once the stream has paused.
+    # An error is printed and the next frame goes on, so the server keeps running
+    def tick(self):
+        # Waiting for the dialog's worker runs the event loop, which may deliver another frame. The updates are
+        # left pending for the next frame instead
+        if self.ticking or self.dialogDraining():
+            return
+        self.ticking = True
+        try:
+            with self.pendingLock:
+                pending = self.pending
+                self.pending = {}
+            if pending or self.uncommitted:
+                self.finishDialogWork()
+            if pending:
+                self.applyUpdates(pending)
+                self.idleTime = 0.0
+            elif self.uncommitted:
+                self.idleTime += FRAME_INTERVAL
+                if self.idleTime >= IDLE_COMMIT:
+                    # A failed commit is tried again after the next pause
+                    self.idleTime = 0.0
+                    self.commit()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.ticking = False
+
+    # Whether the main thread is waiting for the dialog's worker, in the middle of one of the dialog's handlers
+    def dialogDraining(self):
+        if self.mainThreadCall is None:
+            return False
+        from . import gui
+        return gui.transformToolInstance is not None and gui.transformToolInstance.worker.draining
+
+    # On the main thread, let the dialog's worker finish its jobs first, as the dialog itself does
+    def finishDialogWork(self):
+        if self.mainThreadCall is None:
+            return
+        from . import gui
+        if gui.transformToolInstance is not None:
+            gui.transformToolInstance.worker.drain()
+
+    def applyUpdates(self, pending):
+        objectList = objects.objectList
+        present = set(cmd.get_names())
+        # Look for new and deleted objects in the session only when an update names an object the list does not know,
+        # or one that is no longer in PyMOL
+        if objectList is None or any(name not in objectList.byName or name not in present for name in pending):
+            objectList = objects.getObjectList()
+        moved = []
+        steps = []
+        pivots = []
+        for name, values in pending.items():
+            object = objectList.byName.get(name) if name in present else None
+            matrix = np.array(values).reshape(4, 4)
+            # Only rigid transforms are accepted, since the engine inverts them by transposing
+            if object is None or not np.allclose(matrix[0:3, 0:3] @ matrix[0:3, 0:3].T, np.identity(3), atol=1e-4):
+                self.rejected += 1
+                continue
+            if name not in self.uncommitted:
+                # The history starts from the transform before the stream, so it must exist before the object moves
+                object.history
+                self.uncommitted[name] = (object, object.matrix.copy(), object.totals())
+            moved.append(object)
+            steps.append(matrix @ transform.invert(object.matrix))
+            pivots.append(object.getCenter())
+        if moved == []:
+            return
+        # The sliders follow each frame as rotations about the object's center followed by a translation, like a snap
+        deltas = transform.totalsDeltas(np.array(steps), np.array(pivots))
+        for object, step, delta in zip(moved, steps, deltas):
+            object.setMatrix(step @ object.matrix)
+            object.TotalRotation += delta[0:3]
+            object.TotalTranslation += delta[3:6]
+        self.applied += len(moved)
+
+    # Write the streamed transforms to the coordinates in one pass, recording each object's stream as one undo step.
+    # Objects deleted from PyMOL during the stream are left out
+    def commit(self):
+        present = set(cmd.get_names())
+        byName = objects.objectList.byName
+        uncommitted = [(object, matrix, totals) for object, matrix, totals in self.uncommitted.values()
+            if object.name in present and byName.get(object.name) is object]
+        objects.objectList.commitMany([object for object, matrix, totals in uncommitted])
+        for object, matrix, totals in uncommitted:
+            object.history.pushMatrix(object.matrix @ transform.invert(matrix), matrix, totals,
+                np.subtract(object.totals(), totals))
+        self.uncommitted = {}
+
+    # Stop listening and end the thread, then apply and write what is left. Called on PyMOL's main thread.
+    # A thread that already ended, or does not end in time, is left behind instead of blocking PyMOL
+    def stop(self):
+        if self.loop is None:
+            return
+        if self.thread.is_alive():
+            future = asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+            try:
+                future.result(timeout=STOP_TIMEOUT)
+            except concurrent.futures.TimeoutError:
+                print(" tt_server: the server thread did not stop in time")
+            self.thread.join(timeout=STOP_TIMEOUT)
+        self.server = None
+        with objects.lock:
+            self.finishDialogWork()
+            with self.pendingLock:
+                pending = self.pending
+                self.pending = {}
+            if pending:
+                self.applyUpdates(pending)
+            if self.uncommitted:
+                self.commit()
+
+    # Close the listening socket and the client connections, so waiting for the server to close does not wait for
+    # the clients to disconnect
+    async def shutdown(self):
+        self.server.close()
+        tasks = list(self.clients)
+        for task, writer in self.clients.items():
+            writer.close()
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+        self.server = None
+
+# The running server, if any
+server = None
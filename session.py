@@ -0,0 +1,108 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Binary session files for the Transform Tool.
+# Every object's transform and bounded history are stored as a few flat arrays in a numpy .npz file,
+# with the histories of all objects concatenated and indexed by offsets, so saving and loading
+# thousands of objects is a handful of array copies
+
+import numpy as np
+
+from .history import RECORD_WIDTH
+
+SESSION_VERSION = 1
+
+# Write the transforms and histories of the objects in objectList to filename
+def saveSession(filename, objectList):
+    objects = objectList.list
+    count = len(objects)
+    arrays = {
+        "version": np.array(SESSION_VERSION),
+        "names": np.array([object.name for object in objects], dtype=str),
+        "matrices": np.zeros((count, 4, 4)),
+        "totals": np.zeros((count, 6)),
+        "allStates": np.zeros(count, dtype=bool),
+        # start, position and end of each history
+        "historyCounters": np.zeros((count, 3), dtype=np.int64),
+        "historyBaseMatrices": np.zeros((count, 4, 4)),
+        "historyBaseTotals": np.zeros((count, 6)),
+        "recordOffsets": np.zeros(count + 1, dtype=np.int64),
+        "checkpointOffsets": np.zeros(count + 1, dtype=np.int64),
+    }
+    records = []
+    checkpointMatrices = []
+    checkpointTotals = []
+    for index, object in enumerate(objects):
+        arrays["matrices"][index] = object.matrix
+        arrays["totals"][index] = object.totals()
+        arrays["allStates"][index] = object.allStates
+        # An object without a history is saved as an empty one starting at its transform, without creating it
+        history = object.transformHistory
+        if history is None:
+            arrays["historyBaseMatrices"][index] = object.matrix
+            arrays["historyBaseTotals"][index] = object.totals()
+            records.append(np.zeros((0, RECORD_WIDTH)))
+            arrays["recordOffsets"][index + 1] = arrays["recordOffsets"][index]
+            arrays["checkpointOffsets"][index + 1] = arrays["checkpointOffsets"][index]
+            continue
+        arrays["historyCounters"][index] = (history.start, history.position, history.end)
+        arrays["historyBaseMatrices"][index] = history.baseMatrix
+        arrays["historyBaseTotals"][index] = history.baseTotals
+        objectRecords, objectMatrices, objectTotals = history.export()
+        records.append(objectRecords)
+        checkpointMatrices.append(objectMatrices)
+        checkpointTotals.append(objectTotals)
+        arrays["recordOffsets"][index + 1] = arrays["recordOffsets"][index] + len(objectRecords)
+        arrays["checkpointOffsets"][index + 1] = arrays["checkpointOffsets"][index] + len(objectMatrices)
+    arrays["records"] = np.concatenate(records) if records != [] else np.zeros((0, RECORD_WIDTH))
+    arrays["checkpointMatrices"] = np.concatenate(checkpointMatrices) if checkpointMatrices != [] else np.zeros((0, 4, 4))
+    arrays["checkpointTotals"] = np.concatenate(checkpointTotals) if checkpointTotals != [] else np.zeros((0, 6))
+    # Uncompressed, so saving and loading are plain copies
+    with open(filename, "wb") as file:
+        np.savez(file, **arrays)
+
+# Restore the transforms and histories saved in filename onto the objects of objectList with the same names.
+# The objects are moved from wherever they are now straight to their saved transform, with one bulk write.
+# Returns the number of objects restored
+def loadSession(filename, objectList):
+    with np.load(filename) as data:
+        arrays = {key: data[key] for key in data.files}
+    if int(arrays["version"]) > SESSION_VERSION:
+        raise ValueError("%s was written by a newer version of the Transform Tool" % filename)
+    recordOffsets = arrays["recordOffsets"]
+    checkpointOffsets = arrays["checkpointOffsets"]
+    restored = []
+    for index, name in enumerate(arrays["names"]):
+        object = objectList.get(str(name))
+        if object is None:
+            continue
+        # Write anything pending first, so the saved transform replaces the current one exactly
+        object.commit()
+        if object.allStates != bool(arrays["allStates"][index]):
+            object.setAllStates(bool(arrays["allStates"][index]))
+        start, position, end = (int(value) for value in arrays["historyCounters"][index])
+        # An empty history starting at the saved transform is the one the object creates when it first needs it
+        atStart = (np.array_equal(arrays["historyBaseMatrices"][index], arrays["matrices"][index])
+                   and np.array_equal(arrays["historyBaseTotals"][index], arrays["totals"][index]))
+        if start == end and atStart:
+            object.transformHistory = None
+        else:
+            object.history.restore(start, position, end,
+                                   arrays["historyBaseMatrices"][index], arrays["historyBaseTotals"][index],
+                                   arrays["records"][recordOffsets[index]:recordOffsets[index + 1]],
+                                   arrays["checkpointMatrices"][checkpointOffsets[index]:checkpointOffsets[index + 1]],
+                                   arrays["checkpointTotals"][checkpointOffsets[index]:checkpointOffsets[index + 1]])
+        # Set the transform without showing it, since the bulk commit below writes it
+        totals = arrays["totals"][index]
+        object.TotalRotation = [float(value) for value in totals[0:3]]
+        object.TotalTranslation = [float(value) for value in totals[3:6]]
+        object.matrix = arrays["matrices"][index].copy()
+        object.center = None
+        restored.append(object)
+    objectList.commitMany(restored)
+    return len(restored)
@@ -0,0 +1,86 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# 4x4 homogeneous matrix helpers used by the Transform Tool.
+# All matrices are row-major numpy arrays acting on column vectors: x' = M x
+
+import math
+
+import numpy as np
+
+# Index of each rotation axis
+AXES = {"x": 0, "y": 1, "z": 2}
+
+# Return a new 4x4 identity matrix
+def identity():
+    return np.identity(4)
+
+# Return the matrix rotating by angle (in degrees) about the x, y or z axis through the origin
+def rotationMatrix(axis, angle):
+    m = np.identity(4)
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    # The two axes spanning the plane of rotation, in right-handed order
+    i = (AXES[axis] + 1) % 3
+    j = (AXES[axis] + 2) % 3
+    m[i, i] = c
+    m[i, j] = -s
+    m[j, i] = s
+    m[j, j] = c
+    return m
+
+# Return the matrix translating by vector
+def translationMatrix(vector):
+    m = np.identity(4)
+    m[0:3, 3] = vector
+    return m
+
+# Return matrix re-centered so that it acts about point instead of the origin
+def aboutPoint(matrix, point):
+    return translationMatrix(point) @ matrix @ translationMatrix(np.negative(point))
+
+# Return the inverse of a rigid (rotation + translation) matrix
+def invert(matrix):
+    m = np.identity(4)
+    # The inverse of a rotation is its transpose
+    m[0:3, 0:3] = matrix[0:3, 0:3].T
+    m[0:3, 3] = -matrix[0:3, 0:3].T @ matrix[0:3, 3]
+    return m
+
+# Return the inverses of an (n, 4, 4) array of rigid matrices
+def invertMany(matrices):
+    m = np.tile(np.identity(4), (len(matrices), 1, 1))
+    m[:, 0:3, 0:3] = matrices[:, 0:3, 0:3].transpose(0, 2, 1)
+    m[:, 0:3, 3] = -np.einsum("nij,nj->ni", m[:, 0:3, 0:3], matrices[:, 0:3, 3])
+    return m
+
+# Return the angles (in degrees) of the rotations about x, then y, then z that compose each rotation of an (n, 4, 4) array
+def eulerAngles(matrices):
+    r = matrices[:, 0:3, 0:3]
+    x = np.arctan2(r[:, 2, 1], r[:, 2, 2])
+    y = np.arcsin(np.clip(-r[:, 2, 0], -1.0, 1.0))
+    z = np.arctan2(r[:, 1, 0], r[:, 0, 0])
+    return np.degrees(np.stack([x, y, z], axis=1))
+
+# Return the slider totals deltas ((n, 6) array of x/y/z angles and translation) that describe each step of an
+# (n, 4, 4) array as rotations about its pivot ((n, 3) array) followed by a translation
+def totalsDeltas(steps, pivots):
+    deltas = np.empty((len(steps), 6))
+    deltas[:, 0:3] = eulerAngles(steps)
+    deltas[:, 3:6] = np.einsum("nij,nj->ni", steps[:, 0:3, 0:3], pivots) + steps[:, 0:3, 3] - pivots
+    return deltas
+
+# Apply matrix to a single point
+def transformPoint(matrix, point):
+    return matrix[0:3, 0:3] @ np.asarray(point, dtype=float) + matrix[0:3, 3]
+
+# Convert matrix to the 16 float list used by cmd.set_object_ttt.
+# A TTT matrix is [R | post-translation] with the pre-translation in the bottom row,
+# so a homogeneous matrix (pre-translation of 0) has exactly the same layout
+def toTTT(matrix):
+    return [float(value) for value in matrix.flatten()]
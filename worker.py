@@ -0,0 +1,136 @@
+#   Copyright (c)  2023  John Apt.
+#   Permission is granted to copy, distribute and/or modify this document
+#   under the terms of the GNU Free Documentation License, Version 1.2
+#   or any later version published by the Free Software Foundation;
+#   with no Invariant Sections, no Front-Cover Texts, and no Back-Cover
+#   Texts.  A copy of the license is included in the section entitled "GNU
+#   Free Documentation License".
+
+# Background worker that runs the dialog's transforms off the GUI thread.
+# Jobs run one at a time in the order their objects were first queued. A job for an object that
+# already has one waiting replaces it, so only the newest slider values are ever applied
+
+import collections
+import threading
+import traceback
+
+# Import Qt modules
+from PyQt5 import QtCore, QtWidgets
+
+# Seconds drain waits for the worker between runs of the GUI thread's event loop
+DRAIN_POLL = 0.005
+
+class TransformJob:
+    def __init__(self, object, rotation, translation, commit, started):
+        self.object = object
+        # Target totals, or None to leave the object where it is
+        self.rotation = rotation
+        self.translation = translation
+        # Whether to write the transform to the coordinates and end the undo step afterwards
+        self.commit = commit
+        # perf_counter time of the first input the job covers, or None
+        self.started = started
+
+    # Fold an older job for the same object into this one
+    def merge(self, older):
+        if self.rotation is None:
+            self.rotation = older.rotation
+            self.translation = older.translation
+        self.commit = self.commit or older.commit
+        if older.started is not None:
+            self.started = older.started
+
+# Calls function on the thread that created it, through that thread's event loop, whenever trigger is called from any thread
+class MainThreadCall(QtCore.QObject):
+    triggered = QtCore.pyqtSignal()
+
+    def __init__(self, function):
+        QtCore.QObject.__init__(self)
+        self.triggered.connect(function, QtCore.Qt.QueuedConnection)
+
+    def trigger(self):
+        self.triggered.emit()
+
+class CommandWorker(QtCore.QObject):
+    # Emitted after a job ran, with its object, a copy of its matrix taken on the worker thread, and its start time.
+    # Slots on the GUI thread receive it through the event loop, and read the matrix from it rather than from the object
+    applied = QtCore.pyqtSignal(object, object, object)
+    wake = QtCore.pyqtSignal()
+
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        # Waiting jobs by object, in the order the objects were first queued
+        self.pending = collections.OrderedDict()
+        # Whether the worker is running or has been woken, guarded by lock
+        self.busy = False
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        # Whether the GUI thread is waiting in drain, so handlers run by its event loop meanwhile can hold off
+        self.draining = False
+        self.thread = QtCore.QThread()
+        self.moveToThread(self.thread)
+        self.wake.connect(self.run)
+        self.thread.start()
+        # Stop the thread before Qt tears down
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.stop)
+
+    # Queue moving object to the target totals, replacing any job still waiting for it
+    def submit(self, object, rotation=None, translation=None, commit=False, started=None):
+        job = TransformJob(object, rotation, translation, commit, started)
+        with self.lock:
+            older = self.pending.get(id(object))
+            if older is not None:
+                job.merge(older)
+            self.pending[id(object)] = job
+            if self.busy:
+                return
+            self.busy = True
+        self.wake.emit()
+
+    # Wait until every queued job has run. Used before the GUI thread touches the objects itself.
+    # PyMOL calls made by the worker can wait on the GUI thread, so its events keep being processed while waiting,
+    # leaving out user input so no new gestures start meanwhile. Timers and queued calls still run, so the dialog's
+    # frame timer and the streaming server check draining and wait for the next frame instead of changing the objects
+    def drain(self):
+        draining = self.draining
+        self.draining = True
+        try:
+            while True:
+                with self.lock:
+                    if not self.busy:
+                        return
+                    self.idle.wait(DRAIN_POLL)
+                    if not self.busy:
+                        return
+                QtWidgets.QApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+        finally:
+            self.draining = draining
+
+    # Run jobs on the worker thread until the queue is empty
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.busy = False
+                    self.idle.notify_all()
+                    return
+                key, job = self.pending.popitem(last=False)
+            try:
+                self.execute(job)
+            except Exception:
+                traceback.print_exc()
+            self.applied.emit(job.object, job.object.matrix.copy(), job.started)
+
+    def execute(self, job):
+        if job.rotation is not None:
+            job.object.moveTo(job.rotation, job.translation)
+        if job.commit:
+            job.object.commit()
+            job.object.closeStep()
+            # Show the object again in place of its proxy once the drag is written
+            job.object.endFastDrag()
+
+    def stop(self):
+        self.drain()
+        self.thread.quit()
+        self.thread.wait()